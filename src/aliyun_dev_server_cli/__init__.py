@@ -1,27 +1,99 @@
-import pprint
-from alibabacloud_ecs20140526.models import (
-    DescribeImagesRequest,
-    DescribeInstanceTypesRequest,
-)
-import structlog
-from rich.pretty import pprint
+import functools
+import importlib
+import logging
+import os
+import sys
+from typing import TYPE_CHECKING
 
-from .engine import Engine
-from .settings import Settings
-from .aliyun import *
-from .spot_servers import SpotServerCreator, SpotServerSelector, batch_describe_price
-from .types import SingleKeyDict, get_tag_from_single_key_dict
+if TYPE_CHECKING:
+    from .engine import Engine
+    from .settings import Settings, get_settings
+    from .aliyun import (
+        BlockStorageClient,
+        ResourceManagerClient,
+        SnapshotClient,
+        VPCClient,
+    )
+    from .spot_servers import (
+        SpotServerCreator,
+        SpotServerSelector,
+        batch_describe_price,
+    )
+    from .types import SingleKeyDict, get_tag_from_single_key_dict
 
-_log = structlog.get_logger(__name__)
+# Public names are resolved on first access (PEP 562), so importing the package
+# doesn't pay for importing the Aliyun SDK
+_lazy_exports = {
+    "Engine": ".engine",
+    "Settings": ".settings",
+    "get_settings": ".settings",
+    "BlockStorageClient": ".aliyun",
+    "ResourceManagerClient": ".aliyun",
+    "SnapshotClient": ".aliyun",
+    "VPCClient": ".aliyun",
+    "SpotServerCreator": ".spot_servers",
+    "SpotServerSelector": ".spot_servers",
+    "batch_describe_price": ".spot_servers",
+    "SingleKeyDict": ".types",
+    "get_tag_from_single_key_dict": ".types",
+}
+
+
+def __getattr__(name: str):
+    module_name = _lazy_exports.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+@functools.cache
+def _configure_logging():
+    import structlog
+
+    # Same chain as structlog's defaults, but machine-readable output when not
+    # attached to a terminal (structlog prints to stdout by default)
+    if sys.stdout.isatty():
+        renderers = [structlog.dev.ConsoleRenderer()]
+    else:
+        renderers = [
+            structlog.processors.dict_tracebacks,
+            structlog.processors.JSONRenderer(),
+        ]
+
+    structlog.configure(
+        processors=[
+            structlog.contextvars.merge_contextvars,
+            structlog.processors.add_log_level,
+            structlog.processors.StackInfoRenderer(),
+            structlog.dev.set_exc_info,
+            structlog.processors.TimeStamper(fmt="%Y-%m-%d %H:%M:%S", utc=False),
+            *renderers,
+        ],
+        # Filtered when bound, so debug logging (and the payloads guarded by
+        # `is_enabled_for`) is skipped unless enabled, e.g. ALIYUN_CLI_LOG_LEVEL=DEBUG
+        wrapper_class=structlog.make_filtering_bound_logger(_log_level()),
+    )
+
+
+def _log_level() -> int:
+    level_name = os.getenv("ALIYUN_CLI_LOG_LEVEL", "INFO").upper()
+    return logging.getLevelNamesMapping().get(level_name, logging.INFO)
 
 
 def main():
-    settings = Settings.new()
+    _configure_logging()
+
+    from .settings import get_settings
+
+    settings = get_settings()
+
+    # Imported once the settings are valid, so `--help` and configuration errors
+    # don't pay for importing the Aliyun SDK models
+    from .engine import Engine
+
     engine = Engine(settings=settings)
 
     server_selected = engine.select_instance_type()
     engine.relaunch_dev_server(server_selected=server_selected)
-
-
-if __name__ == "__main__":
-    main()
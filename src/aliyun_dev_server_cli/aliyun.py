@@ -4,9 +4,10 @@ This module provides simplified interfaces for interacting with Aliyun's Resourc
 and VPC services, specifically tailored for the dev server CLI application.
 """
 
-from itertools import groupby
-import logging
-from typing import List, Literal
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+import functools
+from typing import Iterator, List, Tuple
 import typing
 from alibabacloud_ecs20140526.client import Client
 from alibabacloud_tea_openapi.models import Config
@@ -16,6 +17,7 @@ from alibabacloud_ecs20140526.models import (
     DescribeDisksRequest,
     DescribeSecurityGroupsRequest,
     DescribeSecurityGroupsRequestTag,
+    DescribeSecurityGroupsResponseBodySecurityGroupsSecurityGroup as SecurityGroupInfo,
     DescribeSnapshotsRequest,
     DescribeSnapshotsRequestTag,
     DescribeDisksResponseBodyDisksDisk as DiskDescription,
@@ -27,25 +29,99 @@ from alibabacloud_tea_openapi.exceptions import ClientException
 from alibabacloud_resourcemanager20200331.client import (
     Client as AliyunResourceManagerClient,
 )
-from alibabacloud_resourcemanager20200331.models import ListResourceGroupsRequest
+from alibabacloud_resourcemanager20200331.models import (
+    ListResourceGroupsRequest,
+    ListResourceGroupsResponseBody,
+)
 from alibabacloud_vpc20160428.client import Client as AliyunVPCClient
 from alibabacloud_vpc20160428.models import (
     DescribeVpcsRequest,
     DescribeVpcsRequestTag,
+    DescribeVpcsResponseBodyVpcsVpc as VpcInfo,
     DescribeVSwitchesRequest,
     DescribeVSwitchesResponseBodyVSwitchesVSwitch as VSwitchInfo,
     DescribeVSwitchesResponseBodyVSwitchesVSwitchTagsTag as VSwitchTag,
 )
-from rich import region
+from pydantic import BaseModel
 import structlog
 
 from aliyun_dev_server_cli.settings import DevServerCreationSettings
 
+from .cache import DescribeCache
 from .types import DiskType, SingleKeyDict, get_tag_from_single_key_dict
 
 _ = Client
 _ = ClientException
 
+# Resource group name to ID mappings are effectively static
+_resource_group_cache_ttl = 24 * 60 * 60
+# Maximum page size accepted by DescribeDisks
+_describe_disks_page_size = 100
+# Maximum page size accepted by DescribeSnapshots
+_describe_snapshots_page_size = 100
+# Maximum number of disk IDs accepted by one ModifyDiskAttribute call
+_modify_disk_attribute_batch_size = 100
+# Maximum number of resource IDs accepted by one TagResources call
+_tag_resources_batch_size = 50
+
+
+def _paginate[T](
+    describe: Callable[[typing.Any], typing.Any],
+    request: typing.Any,
+    items: Callable[[typing.Any], List[T]],
+) -> Iterator[T]:
+    """Lazily yield the items of every page of a NextToken paginated Describe* call.
+
+    Args:
+        describe: Client method issuing the Describe* call
+        request: The request, whose `next_token` is advanced page by page
+        items: Function extracting the items from a response body
+
+    Yields:
+        The described items in the order returned by the API
+    """
+    while True:
+        body = describe(request).body
+        yield from items(body)
+        if not body.next_token:
+            return
+        request.next_token = body.next_token
+
+
+def _chunked[T](seq: List[T], size: int) -> Iterator[List[T]]:
+    for i in range(0, len(seq), size):
+        yield seq[i : i + size]
+
+
+def _creation_key(item) -> str:
+    # Creation times are ISO 8601 UTC strings, which order chronologically
+    return item.creation_time or ""
+
+
+def _pick_latest[T](items: List[T], name: str, log: Callable[..., object]) -> T:
+    """Pick the most recently created item, logging when there are several.
+
+    Args:
+        items: Non-empty list of described resources carrying a `creation_time`
+        name: Plural resource name used in the log message
+        log: Logger method used to report multiple candidates
+
+    Returns:
+        The most recently created item
+    """
+    if len(items) > 1:
+        log(
+            f"Multiple {name} (%i) matching the requirements were found. Using the most recently created one.",
+            len(items),
+        )
+    return max(items, key=_creation_key)
+
+
+@functools.lru_cache(maxsize=None)
+def _executor() -> ThreadPoolExecutor:
+    """Executor shared by the clients to issue independent API calls concurrently."""
+    return ThreadPoolExecutor(max_workers=4)
+
 
 class ResourceManagerClient:
     """Client for managing Aliyun Resource Manager operations.
@@ -55,18 +131,22 @@ class ResourceManagerClient:
     """
 
     def __init__(
-        self, access_key_id: str, access_key_secret: str, resource_group_name: str
+        self,
+        config: Config,
+        resource_group_name: str,
+        describe_cache: DescribeCache | None = None,
     ):
         """Initialize the ResourceManagerClient.
 
         Args:
-            access_key_id: Aliyun access key ID for authentication
-            access_key_secret: Aliyun access key secret for authentication
+            config: Aliyun client config shared with the other clients
             resource_group_name: Name of the resource group to manage
+            describe_cache: Cache persisting the resource group lookup between runs,
+                the lookup is not cached if omitted
         """
-        self.client = AliyunResourceManagerClient(
-            Config(access_key_id=access_key_id, access_key_secret=access_key_secret)
-        )
+        self.client = AliyunResourceManagerClient(config)
+        self.describe_cache = describe_cache
+        self._access_key_id = config.access_key_id
         self._resource_group_id = self._fetch_resource_group_id(resource_group_name)
 
     def resource_group_id(self) -> str:
@@ -80,6 +160,10 @@ class ResourceManagerClient:
     def _fetch_resource_group_id(self, resource_group_name: str) -> str:
         """Fetch the resource group ID by name.
 
+        The name to ID mapping is effectively static, so the lookup is served from
+        the describe cache when available. Only validated lookups are cached, and a
+        cached lookup failing validation is dropped and fetched again.
+
         Args:
             resource_group_name: Name of the resource group to fetch
 
@@ -90,11 +174,44 @@ class ResourceManagerClient:
             ValueError: If no resource group or multiple resource groups are found,
                 or if the resource group status is not OK
         """
+        if self.describe_cache is None:
+            return self._validate_resource_groups(
+                resource_group_name, self._list_resource_groups(resource_group_name)
+            )
+
+        key = DescribeCache.key(
+            "ListResourceGroups", self._access_key_id, resource_group_name
+        )
+        cached = self.describe_cache.get(
+            key, _resource_group_cache_ttl, ListResourceGroupsResponseBody
+        )
+        if cached is not None:
+            try:
+                return self._validate_resource_groups(resource_group_name, cached)
+            except ValueError:
+                self.describe_cache.invalidate(key)
+
+        resource_groups = self._list_resource_groups(resource_group_name)
+        resource_group_id = self._validate_resource_groups(
+            resource_group_name, resource_groups
+        )
+        self.describe_cache.put(key, resource_groups)
+        return resource_group_id
+
+    def _list_resource_groups(
+        self, resource_group_name: str
+    ) -> ListResourceGroupsResponseBody:
         # Query Aliyun Resource Manager for resource groups matching the provided name
         resource_groups = self.client.list_resource_groups(
             ListResourceGroupsRequest(name=resource_group_name)
         )
-        resource_groups = resource_groups.body.resource_groups.resource_group
+        return resource_groups.body
+
+    @staticmethod
+    def _validate_resource_groups(
+        resource_group_name: str, resource_groups: ListResourceGroupsResponseBody
+    ) -> str:
+        resource_groups = resource_groups.resource_groups.resource_group
 
         # Validate that exactly one resource group was found
         if len(resource_groups) > 1:
@@ -128,8 +245,8 @@ class VPCClient:
 
     def __init__(
         self,
-        access_key_id: str,
-        access_key_secret: str,
+        ecs_client: Client,
+        vpc_client: AliyunVPCClient,
         region_id: str,
         resource_group_id: str,
         # use this tag to filter suitable VPC and security group but not used in VSwitch filtering
@@ -140,27 +257,30 @@ class VPCClient:
         """Initialize the VPCClient.
 
         Args:
-            access_key_id: Aliyun access key ID for authentication
-            access_key_secret: Aliyun access key secret for authentication
+            ecs_client: Aliyun ECS client shared with the other clients
+            vpc_client: Aliyun VPC client shared with the other clients
             region_id: Region ID where the VPC is located
             resource_group_id: ID of the resource group to filter VPCs
             included_automation_tag: Tag to filter suitable VPCs (not used for VSwitch filtering)
             excluded_automation_tag: Tag to filter suitable VSwitches under the target VPC (not used for VPC filtering)
         """
-        config = Config(
-            access_key_id=access_key_id,
-            access_key_secret=access_key_secret,
-            region_id=region_id,
-        )
-        self.client = AliyunVPCClient(config=config)
-        self.ecs_client = Client(config=config)
+        self.client = vpc_client
+        self.ecs_client = ecs_client
         self.region_id = region_id
         self.resource_group_id = resource_group_id
         self.included_automation_tag = VPCClient._dict_tags_to_request_tags(
             included_automation_tag
         )
+        self._security_group_request_tags = (
+            VPCClient._dict_tags_to_security_groups_request_tags(included_automation_tag)
+        )
         self.excluded_automation_tag = excluded_automation_tag
+        # Extract the exclusion tag key and value once rather than per VSwitch
+        self._excluded_tag_key, self._excluded_tag_value = (
+            get_tag_from_single_key_dict(excluded_automation_tag)
+        )
         self._original_included_automation_tag = included_automation_tag
+        self._vpc_cache: VpcInfo | None = None
         self.logger = structlog.get_logger()
 
     @staticmethod
@@ -197,7 +317,27 @@ class VPCClient:
             for (key, value) in tags.items()
         ]
 
-    def describe_matched_vpc(self):
+    def describe_matched_vpc(self) -> VpcInfo:
+        """Describe VPCs that match the specified criteria.
+
+        The matched VPC is described once per client; later calls reuse it until
+        `invalidate_vpc_cache` is called.
+
+        Returns:
+            The matched VPC information
+
+        Raises:
+            ValueError: If no matching VPCs are found
+        """
+        if self._vpc_cache is None:
+            self._vpc_cache = self._describe_matched_vpc_uncached()
+        return self._vpc_cache
+
+    def invalidate_vpc_cache(self):
+        """Forget the matched VPC so that the next lookup describes it again."""
+        self._vpc_cache = None
+
+    def _describe_matched_vpc_uncached(self) -> VpcInfo:
         """Describe VPCs that match the specified criteria.
 
         Returns:
@@ -222,17 +362,26 @@ class VPCClient:
                 f"VPCs matching resource group ID {self.resource_group_id} and tag {self._original_included_automation_tag} "
                 + f"under region ID {self.region_id} are not found"
             )
-        elif len(vpcs) > 1:
-            self.logger.warning(
-                "Multiple VPCs (%i) matching the requirements were found. Using the most recently created one.",
-                len(vpcs),
-            )
-            # Sort by creation time to select the most recent one
-            vpcs.sort(key=lambda x: str(x.creation_time), reverse=True)
 
-        # Return the first (most recent) VPC from our sorted list
-        vpc = vpcs[0]
-        return vpc
+        # Select the most recently created VPC
+        return _pick_latest(vpcs, "VPCs", self.logger.warning)
+
+    def describe_network(
+        self,
+    ) -> Tuple[VpcInfo, List[VSwitchInfo], SecurityGroupInfo]:
+        """Describe the matched VPC along with its VSwitches and security group.
+
+        The VSwitches and the security group only depend on the VPC ID, so they
+        are described concurrently once the VPC is known.
+
+        Returns:
+            A tuple of the matched VPC, its VSwitches and the matched security group
+        """
+        vpc = self.describe_matched_vpc()
+        vpc_id = typing.cast(str, vpc.vpc_id)
+        vswitches = _executor().submit(self.describe_matched_vswitches, vpc_id)
+        security_group = self.describe_security_group(vpc_id)
+        return vpc, vswitches.result(), security_group
 
     def describe_matched_vswitches(self, vpc_id: str) -> List[VSwitchInfo]:
         """Describe VSwitches that match the specified VPC.
@@ -257,11 +406,18 @@ class VPCClient:
 
         return result
 
-    def get_suitable_vswitch(self, zone_id: str, vpc_id: str) -> VSwitchInfo:
+    def get_suitable_vswitch(
+        self,
+        zone_id: str,
+        vpc_id: str,
+        vswitches: List[VSwitchInfo] | None = None,
+    ) -> VSwitchInfo:
         """Get a suitable VSwitch for the specified zone.
 
         Args:
             zone_id: Zone ID to find a suitable VSwitch for
+            vpc_id: The ID of the VPC to find VSwitches for
+            vswitches: VSwitches of the VPC fetched beforehand, fetched if omitted
 
         Returns:
             Suitable VSwitch information
@@ -270,23 +426,15 @@ class VPCClient:
             ValueError: If no suitable VSwitch is found for the zone
         """
         # Get all VSwitches that match our VPC
-        vswitches = self.describe_matched_vswitches(vpc_id)
-
-        # Sort and group VSwitches by zone ID
-        vswitches.sort(key=lambda x: typing.cast(str, x.zone_id))
-        grouped_vswitches = groupby(
-            vswitches, key=lambda x: typing.cast(str, x.zone_id)
-        )
-        grouped_vswitches = {key: list(g) for key, g in grouped_vswitches}
-
-        # Filter to only VSwitches in the requested zone
-        suitable_vswitches = grouped_vswitches[zone_id]
+        if vswitches is None:
+            vswitches = self.describe_matched_vswitches(vpc_id)
 
-        # Further filter out VSwitches that match our exclusion tags
+        # Filter to VSwitches in the requested zone that don't match our exclusion tags
         suitable_vswitches = [
             it
-            for it in suitable_vswitches
-            if not self._shall_exclude(it.tags.tag if it.tags else [])
+            for it in vswitches
+            if it.zone_id == zone_id
+            and not self._shall_exclude(it.tags.tag if it.tags else [])
         ]
 
         # Handle cases where we find zero or multiple suitable VSwitches
@@ -294,16 +442,9 @@ class VPCClient:
             raise ValueError(
                 f"No VSwitch matching the fetched VPC under zone ID {zone_id} was found"
             )
-        elif len(suitable_vswitches) > 1:
-            self.logger.warning(
-                "Multiple VSwitches (%i) matching the requirements were found. Using the most recently created one.",
-                len(suitable_vswitches),
-            )
-            # Sort by creation time to select the most recent one
-            suitable_vswitches.sort(key=lambda x: str(x.creation_time), reverse=True)
 
-        # Return the first (most recent) suitable VSwitch
-        return suitable_vswitches[0]
+        # Select the most recently created suitable VSwitch
+        return _pick_latest(suitable_vswitches, "VSwitches", self.logger.warning)
 
     def _shall_exclude(self, tags_from_item: List[VSwitchTag]) -> bool:
         """Determine if an item should be excluded based on its tags.
@@ -314,18 +455,13 @@ class VPCClient:
         Returns:
             True if the item should be excluded, False otherwise
         """
-        # Extract the exclusion tag key and value we're looking for
-        excluded_tag, excluded_tag_value = get_tag_from_single_key_dict(
-            self.excluded_automation_tag
-        )
-
         # Check if any of the item's tags match our exclusion criteria
         return any(
-            tag.key == excluded_tag and tag.value == excluded_tag_value
+            tag.key == self._excluded_tag_key and tag.value == self._excluded_tag_value
             for tag in tags_from_item
         )
 
-    def describe_security_group(self, vpc_id: str):
+    def describe_security_group(self, vpc_id: str) -> SecurityGroupInfo:
         """Describe security groups that match the specified VPC and tags.
 
         Args:
@@ -341,9 +477,7 @@ class VPCClient:
             DescribeSecurityGroupsRequest(
                 region_id=self.region_id,
                 vpc_id=vpc_id,
-                tag=VPCClient._dict_tags_to_security_groups_request_tags(
-                    self._original_included_automation_tag
-                ),
+                tag=self._security_group_request_tags,
                 resource_group_id=self.resource_group_id,
             )
         )
@@ -359,17 +493,9 @@ class VPCClient:
                 f"Security groups matching tag {self._original_included_automation_tag} "
                 + f"under VPC ID {vpc_id} and region ID {self.region_id} are not found"
             )
-        elif len(security_groups) > 1:
-            self.logger.warning(
-                "Multiple security groups (%i) matching the requirements were found. Using the most recently created one.",
-                len(security_groups),
-            )
-            # Sort by creation time to select the most recent one
-            security_groups.sort(key=lambda x: str(x.creation_time), reverse=True)
 
-        # Return the first (most recent) security group from our sorted list
-        security_group = security_groups[0]
-        return security_group
+        # Select the most recently created security group
+        return _pick_latest(security_groups, "security groups", self.logger.warning)
 
 
 class SnapshotClient:
@@ -399,16 +525,18 @@ class SnapshotClient:
         ]
 
     def describe_matched_snapshots(self, source_disk_type: DiskType = "data"):
-        snapshots = self.client.describe_snapshots(
-            DescribeSnapshotsRequest(
-                region_id=self.region_id,
-                resource_group_id=self.resource_group_id,
-                source_disk_type=source_disk_type,
-                tag=self.tags,
+        request = DescribeSnapshotsRequest(
+            region_id=self.region_id,
+            resource_group_id=self.resource_group_id,
+            source_disk_type=source_disk_type,
+            tag=self.tags,
+            max_results=_describe_snapshots_page_size,
+        )
+        return list(
+            _paginate(
+                self.client.describe_snapshots, request, lambda b: b.snapshots.snapshot
             )
         )
-        snapshots = snapshots.body.snapshots.snapshot
-        return snapshots
 
     @staticmethod
     def _dict_to_request_tag(tag: SingleKeyDict) -> DescribeSnapshotsRequestTag:
@@ -423,14 +551,7 @@ class SnapshotClient:
                 + f"with source disk type '{source_disk_type}' "
                 + f"under region ID {self.region_id} and resource group ID {self.resource_group_id} are found"
             )
-        elif len(snapshots) > 1:
-            logger = structlog.get_logger()
-            logger.info(
-                "Multiple snapshots (%i) matching the requirements were found. Using the most recently created one.",
-                len(snapshots),
-            )
-        snapshots.sort(key=lambda x: str(x.creation_time), reverse=True)
-        return snapshots[0]
+        return _pick_latest(snapshots, "snapshots", structlog.get_logger().info)
 
     @staticmethod
     def _dict_to_disk_request_tag(tag: SingleKeyDict) -> CreateSnapshotRequestTag:
@@ -460,6 +581,23 @@ class SnapshotClient:
         return snapshot_id
 
 
+class InstanceDisks(BaseModel, arbitrary_types_allowed=True):
+    """Disks attached to an ECS instance, split by disk type."""
+
+    system: DiskDescription
+    data: List[DiskDescription]
+
+    def all(self) -> List[DiskDescription]:
+        return [self.system, *self.data]
+
+
+class DiskIdPartition(BaseModel):
+    """Disk IDs grouped by the post-creation operation they are subject to."""
+
+    cloud_auto_ids: List[str]
+    data_disk_ids: List[str]
+
+
 class BlockStorageClient:
     def __init__(self, client: Client, region_id: str, resource_group_id: str) -> None:
         self.client = client
@@ -468,38 +606,86 @@ class BlockStorageClient:
         self.logger = structlog.get_logger()
 
     def describe_disks(self, ecs_instance_id: str) -> List[DiskDescription]:
-        disks = self.client.describe_disks(
-            DescribeDisksRequest(
-                region_id=self.region_id,
-                instance_id=ecs_instance_id,
-                resource_group_id=self.resource_group_id,
-            )
+        """Describe disks attached to an ECS instance.
+
+        Args:
+            ecs_instance_id: The ID of the instance whose disks are described
+
+        Returns:
+            List of disk descriptions
+        """
+        request = DescribeDisksRequest(
+            region_id=self.region_id,
+            instance_id=ecs_instance_id,
+            resource_group_id=self.resource_group_id,
+            max_results=_describe_disks_page_size,
         )
-        disks = disks.body.disks.disk
-        return disks
+        return list(
+            _paginate(self.client.describe_disks, request, lambda b: b.disks.disk)
+        )
+
+    @staticmethod
+    def split_disks(disks: List[DiskDescription]) -> InstanceDisks:
+        """Split the disks of an instance by disk type in a single pass.
+
+        Args:
+            disks: List of disk descriptions attached to one instance
+
+        Returns:
+            The system disk and the data disks
+
+        Raises:
+            RuntimeError: If the instance doesn't have exactly one system disk
+        """
+        system_disks: List[DiskDescription] = []
+        data_disks: List[DiskDescription] = []
+        for disk in disks:
+            if disk.type == "system":
+                system_disks.append(disk)
+            elif disk.type == "data":
+                data_disks.append(disk)
+
+        if len(system_disks) != 1:
+            raise RuntimeError(
+                f"Exactly one system disk is expected, but {len(system_disks)} were found"
+            )
+
+        return InstanceDisks(system=system_disks[0], data=data_disks)
 
     @staticmethod
-    def filter_disk_by_disk_type(disks: List[DiskDescription], type: DiskType):
-        return [disk for disk in disks if disk.type == type]
+    def partition_disks(disks: List[DiskDescription]) -> DiskIdPartition:
+        """Collect the IDs of cloud-auto disks and data disks in a single pass.
 
-    def toggle_bursting(self, disks: List[DiskDescription], enabled: bool):
-        """Toggle bursting mode for supported disks.
+        Args:
+            disks: List of disk descriptions to partition
+
+        Returns:
+            The IDs of the disks supporting bursting mode and of the data disks
+        """
+        cloud_auto_ids: List[str] = []
+        data_disk_ids: List[str] = []
+        for disk in disks:
+            if disk.category == "cloud_auto":
+                cloud_auto_ids.append(typing.cast(str, disk.disk_id))
+            if disk.type == "data":
+                data_disk_ids.append(typing.cast(str, disk.disk_id))
+        return DiskIdPartition(
+            cloud_auto_ids=cloud_auto_ids, data_disk_ids=data_disk_ids
+        )
 
-        Only cloud-auto disks (auto-PL) support bursting mode. Other disk types will be ignored.
+    def set_bursting(self, disk_ids: List[str], enabled: bool):
+        """Set bursting mode of cloud-auto disks by ID.
 
         Args:
-            disks: List of disk descriptions to potentially modify
+            disk_ids: IDs of cloud-auto disks to modify
             enabled: Whether to enable or disable bursting mode
 
         Returns:
             The number of disks for which bursting mode was modified
         """
-        # Filter to only cloud_auto disks as they are the only ones supporting bursting
-        disk_ids = [disk.disk_id for disk in disks if disk.category == "cloud_auto"]
-        disk_ids = typing.cast(List[str], disk_ids)
-        self.client.modify_disk_attribute(
-            ModifyDiskAttributeRequest(disk_ids=disk_ids, bursting_enabled=enabled)
-        )
+        # DiskIds is capped per call, so larger lists are split and sent concurrently
+        for future in self._submit_set_bursting(disk_ids, enabled):
+            future.result()
 
         self.logger.debug(
             "toggle bursting_enabled to %s for %i disk(s).",
@@ -510,40 +696,108 @@ class BlockStorageClient:
 
         return len(disk_ids)
 
-    def tag_data_disks(self, disks: List[DiskDescription], tag: SingleKeyDict):
-        """Tag data disks with a tag for future identification.
+    def tag_disks(self, disk_ids: List[str], tag: SingleKeyDict):
+        """Tag disks by ID.
 
-        Filters the provided disks to only include data disks, then tags the specified
-        tag to these disks.
+        Args:
+            disk_ids: IDs of the disks to tag
+            tag: The tag to apply to the disks
+
+        Returns:
+            The number of disks that were tagged
+        """
+        # ResourceId is capped per call, so larger lists are split and sent concurrently
+        for future in self._submit_tag_disks(disk_ids, tag):
+            future.result()
+
+        self.logger.debug(
+            "tag %i disk(s).",
+            len(disk_ids),
+            disk_ids=disk_ids,
+            tag=tag,
+        )
+
+        return len(disk_ids)
+
+    def finalize_disks(
+        self, disks: List[DiskDescription], *, bursting: bool, tag: SingleKeyDict
+    ):
+        """Toggle bursting mode and tag data disks of newly created disks.
+
+        The disks are partitioned once, then the API calls of both operations,
+        independent of each other, are issued concurrently.
 
         Args:
-            disks: List of disk descriptions to potentially tag
+            disks: List of disk descriptions to finalize
+            bursting: Whether to enable or disable bursting mode
             tag: The tag to apply to data disks for identification
 
         Returns:
-            The number of data disks that were tagged
+            A tuple of the number of disks whose bursting mode was modified and
+            the number of data disks that were tagged
         """
-        key, value = get_tag_from_single_key_dict(tag)
-        data_disks = self.filter_disk_by_disk_type(disks=disks, type="data")
-        data_disk_ids = [disk.disk_id for disk in data_disks]
-        data_disk_ids = typing.cast(List[str], data_disk_ids)
-        self.client.tag_resources(
-            TagResourcesRequest(
-                region_id=self.region_id,
-                resource_type="disk",
-                resource_id=data_disk_ids,
-                tag=[TagResourcesRequestTag(key=key, value=value)],
-            )
-        )
+        partition = self.partition_disks(disks)
+        # Only the API calls are submitted, so the shared executor is never waited
+        # on from one of its own workers
+        futures = [
+            *self._submit_set_bursting(partition.cloud_auto_ids, bursting),
+            *self._submit_tag_disks(partition.data_disk_ids, tag),
+        ]
+        for future in futures:
+            future.result()
 
         self.logger.debug(
-            "tag %i data disk(s).",
-            len(data_disk_ids),
-            data_disk_ids=data_disk_ids,
+            "finalized disks.",
+            cloud_auto_ids=partition.cloud_auto_ids,
+            data_disk_ids=partition.data_disk_ids,
             tag=tag,
         )
 
-        return len(data_disk_ids)
+        return len(partition.cloud_auto_ids), len(partition.data_disk_ids)
+
+    def _submit_set_bursting(
+        self, disk_ids: List[str], enabled: bool
+    ) -> List[Future[None]]:
+        def modify(chunk: List[str]):
+            result = self.client.modify_disk_attribute(
+                ModifyDiskAttributeRequest(disk_ids=chunk, bursting_enabled=enabled)
+            )
+            self.logger.debug(
+                "modified disk attribute.",
+                request_id=result.body.request_id,
+                disk_ids=chunk,
+            )
+
+        return [
+            _executor().submit(modify, chunk)
+            for chunk in _chunked(disk_ids, _modify_disk_attribute_batch_size)
+        ]
+
+    def _submit_tag_disks(
+        self, disk_ids: List[str], tag: SingleKeyDict
+    ) -> List[Future[None]]:
+        key, value = get_tag_from_single_key_dict(tag)
+        request_tags = [TagResourcesRequestTag(key=key, value=value)]
+
+        def tag_chunk(chunk: List[str]):
+            result = self.client.tag_resources(
+                TagResourcesRequest(
+                    region_id=self.region_id,
+                    resource_type="disk",
+                    resource_id=chunk,
+                    tag=request_tags,
+                )
+            )
+            self.logger.debug(
+                "tagged resources.",
+                request_id=result.body.request_id,
+                disk_ids=chunk,
+            )
+
+        return [
+            _executor().submit(tag_chunk, chunk)
+            for chunk in _chunked(disk_ids, _tag_resources_batch_size)
+        ]
 
 
 if __name__ == "__main__":
@@ -568,17 +822,17 @@ if __name__ == "__main__":
     )
 
     disks = block_storage_client.describe_disks(ecs_instance_id=ecs_instance_id)
-    data_disks = block_storage_client.filter_disk_by_disk_type(disks, "data")
+    partition = block_storage_client.partition_disks(disks)
 
-    assert len(data_disks) == 1 and data_disks[0].type == "data"
+    assert len(partition.data_disk_ids) == 1
 
-    block_storage_client.toggle_bursting(disks, True)
-    num_toggled = block_storage_client.toggle_bursting(disks, False)
+    block_storage_client.set_bursting(partition.cloud_auto_ids, True)
+    num_toggled = block_storage_client.set_bursting(partition.cloud_auto_ids, False)
 
     assert num_toggled == 2
 
-    num_tagged = block_storage_client.tag_data_disks(
-        disks=disks, tag={"nysparis:test:tag1": "true"}
+    num_tagged = block_storage_client.tag_disks(
+        partition.data_disk_ids, tag={"nysparis:test:tag1": "true"}
     )
 
     assert num_tagged == 1
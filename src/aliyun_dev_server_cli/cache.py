@@ -0,0 +1,142 @@
+"""On-disk TTL cache for slowly changing Aliyun Describe* responses.
+
+Instance type catalogues and image lists change on the order of hours to days,
+so re-describing them on every CLI run only adds round-trips. Response bodies
+are stored as JSON (via the SDK models' `to_map`/`from_map`) under the user's
+cache directory, keyed by a hash of the request parameters.
+"""
+
+from collections.abc import Callable
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import time
+
+from Tea.model import TeaModel
+import structlog
+
+_log = structlog.get_logger(__name__)
+
+_cache_dir = pathlib.Path.home() / ".cache" / "aliyun-dev-server-cli"
+# Bump when the layout of cached entries changes to invalidate older entries
+_cache_version = 1
+
+
+class DescribeCache:
+    """TTL cache persisting Describe* response bodies on disk."""
+
+    def __init__(
+        self,
+        cache_dir: pathlib.Path = _cache_dir,
+        refresh: bool = False,
+        scope: str = "",
+    ) -> None:
+        """Initialize the DescribeCache.
+
+        Args:
+            cache_dir: Directory where cache entries are stored
+            refresh: Whether to bypass cached entries and always fetch (the
+                fetched result still refreshes the cache)
+            scope: Identifier (e.g. a hash of the settings) the entries are
+                stored under, entries of other scopes are never served
+        """
+        self.cache_dir = cache_dir / scope if scope else cache_dir
+        self.refresh = refresh
+
+    @staticmethod
+    def key(*parts: object) -> str:
+        """Build a cache key from the request parameters.
+
+        Args:
+            parts: Request parameters identifying the cached response
+
+        Returns:
+            The hex digest identifying the cache entry
+        """
+        raw = "|".join(str(part) for part in (_cache_version, *parts))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get[M: TeaModel](self, key: str, ttl: float, model: type[M]) -> M | None:
+        """Return the cached response body if present and fresh.
+
+        Args:
+            key: Cache key built by `DescribeCache.key`
+            ttl: Seconds a cached entry stays valid
+            model: Response body model class used to deserialize the entry
+
+        Returns:
+            The cached response body, or None on miss or in refresh mode
+        """
+        if self.refresh:
+            return None
+
+        cached = self._load(self.cache_dir / f"{key}.json", ttl)
+        if cached is None:
+            return None
+
+        _log.debug("describe cache hit.", key=key)
+        return model().from_map(cached)
+
+    def put(self, key: str, value: TeaModel):
+        """Store a response body in the cache.
+
+        Args:
+            key: Cache key built by `DescribeCache.key`
+            value: Response body to store
+        """
+        self._save(self.cache_dir / f"{key}.json", value.to_map())
+
+    def get_or_fetch[M: TeaModel](
+        self, key: str, ttl: float, model: type[M], fetch: Callable[[], M]
+    ) -> M:
+        """Return the cached response body, fetching and caching it on miss.
+
+        Args:
+            key: Cache key built by `DescribeCache.key`
+            ttl: Seconds a cached entry stays valid
+            model: Response body model class used to deserialize the entry
+            fetch: Function issuing the API call on cache miss
+
+        Returns:
+            The cached or freshly fetched response body
+        """
+        cached = self.get(key, ttl, model)
+        if cached is not None:
+            return cached
+
+        result = fetch()
+        self.put(key, result)
+        return result
+
+    def invalidate(self, key: str):
+        """Remove a cache entry if present.
+
+        Args:
+            key: Cache key built by `DescribeCache.key`
+        """
+        (self.cache_dir / f"{key}.json").unlink(missing_ok=True)
+
+    @staticmethod
+    def _load(path: pathlib.Path, ttl: float) -> dict | None:
+        try:
+            if time.time() - path.stat().st_mtime > ttl:
+                return None
+            with path.open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Missing or corrupted entries are treated as misses
+            return None
+
+    def _save(self, path: pathlib.Path, value: dict):
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with tmp_path.open("w") as f:
+                json.dump(value, f)
+            # Atomic replace so concurrent runs never read a partial entry
+            os.replace(tmp_path, path)
+        except OSError as err:
+            _log.debug("failed to write describe cache.", path=str(path), error=err)
+            tmp_path.unlink(missing_ok=True)
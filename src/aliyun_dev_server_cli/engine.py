@@ -1,7 +1,25 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cached_property
+import logging
+import os
+import random
+import re
+import time
 import typing
+from typing import Iterator, List
 from alibabacloud_ecs20140526.models import (
     DescribeImagesRequest,
+    DescribeImagesResponseBodyImagesImage as ImageInfo,
     DescribeInstanceTypesRequest,
+    DescribeInstanceTypesResponseBody,
+    DescribeInstanceTypesResponseBodyInstanceTypes,
+    DescribeInstanceTypesResponseBodyInstanceTypesInstanceType as InstanceTypeInfo,
+    DescribeImagesResponseBody,
+    DescribeSecurityGroupsResponseBodySecurityGroupsSecurityGroup as SecurityGroupInfo,
+    DescribeSnapshotsResponseBodySnapshotsSnapshot as SnapshotInfo,
+)
+from alibabacloud_vpc20160428.models import (
+    DescribeVSwitchesResponseBodyVSwitchesVSwitch as VSwitchInfo,
 )
 import structlog
 
@@ -11,50 +29,249 @@ from .spot_servers import (
     SpotServerCreator,
     SpotServerSelector,
     batch_describe_price,
+    describe_exact_price,
+    iter_instance_types,
 )
+from .cache import DescribeCache
 from .aliyun import BlockStorageClient, ResourceManagerClient, SnapshotClient, VPCClient
 
 _log = structlog.get_logger(__name__)
 
+# Instance type catalogues and image lists change on the order of hours to days
+_instance_types_cache_ttl = 15 * 60
+_images_cache_ttl = 60 * 60
+
+_image_id_re = re.compile(r"^m-[a-z0-9]+$")
+
+# Polling of the disks of a created instance, in seconds
+_disk_poll_initial_delay = 0.3
+_disk_poll_max_delay = 5.0
+_disk_poll_backoff = 1.5
+_disk_poll_timeout = 30.0
+
 
 class Engine:
     def __init__(self, settings: Settings) -> None:
         self.settings = settings
-        self.ecs_client = settings.get_aliyun_client()
+        self.ecs_client = settings.aliyun_client
+        self.describe_cache = DescribeCache(
+            refresh=settings.refresh_cache, scope=settings.cache_scope
+        )
+        # Aliyun API calls are I/O bound, so independent ones are issued concurrently
+        self._executor = ThreadPoolExecutor(max_workers=8)
+        self._resource_group_id_future: Future[str] | None = None
+        self._image_future: Future[ImageInfo] | None = None
+        self._network_future: (
+            Future[tuple[str, List[VSwitchInfo], SecurityGroupInfo]] | None
+        ) = None
+        self._snapshot_future: Future[SnapshotInfo] | None = None
+
+    def _prefetch_launch_resources(self):
+        """Start fetching the launch resources which don't depend on the selected server.
+
+        VSwitches are fetched for every zone of the matched VPC, so the suitable
+        one for the selected zone can be picked without another round-trip.
+        """
+        executor = self._executor
+        if self._resource_group_id_future is None:
+            self._resource_group_id_future = executor.submit(
+                self._fetch_resource_group_id
+            )
+        if self._image_future is None:
+            self._image_future = executor.submit(self._describe_image)
+        if self._network_future is None:
+            self._network_future = executor.submit(self._describe_network)
+        if self._snapshot_future is None:
+            self._snapshot_future = executor.submit(self._describe_snapshot)
+
+    def _resource_group_id(self) -> str:
+        return typing.cast(Future[str], self._resource_group_id_future).result()
+
+    # Aliyun wrapper clients are built once and shared by every step of the workflow
+
+    @cached_property
+    def resource_manager_client(self) -> ResourceManagerClient:
+        settings = self.settings
+        return ResourceManagerClient(
+            settings.aliyun_config,
+            settings.spot_instance_creation.dev_server.resource_group_name,
+            # Persisting the lookup can be disabled, e.g. for CI runs
+            describe_cache=(
+                None
+                if os.getenv("ALIYUN_CLI_RG_CACHE") == "0"
+                else self.describe_cache
+            ),
+        )
+
+    @cached_property
+    def vpc_client(self) -> VPCClient:
+        settings = self.settings
+        dev_server_creation_settings = settings.spot_instance_creation.dev_server
+        return VPCClient(
+            self.ecs_client,
+            settings.vpc_client,
+            settings.region_id,
+            self._resource_group_id(),
+            dev_server_creation_settings.included_automation_tag,
+            dev_server_creation_settings.excluded_automation_tag,
+        )
+
+    @cached_property
+    def snapshot_client(self) -> SnapshotClient:
+        settings = self.settings
+        dev_server_creation_settings = settings.spot_instance_creation.dev_server
+        return SnapshotClient(
+            self.ecs_client,
+            region_id=settings.region_id,
+            resource_group_id=self._resource_group_id(),
+            included_automation_tag=dev_server_creation_settings.included_automation_tag,
+            dev_data_snapshot_identifier_tag=dev_server_creation_settings.dev_data_snapshot_content_identifier_tag(),
+            settings=dev_server_creation_settings,
+        )
+
+    @cached_property
+    def block_storage_client(self) -> BlockStorageClient:
+        return BlockStorageClient(
+            self.ecs_client, self.settings.region_id, self._resource_group_id()
+        )
+
+    @cached_property
+    def spot_server_creator(self) -> SpotServerCreator:
+        settings = self.settings
+        dev_server_creation_settings = settings.spot_instance_creation.dev_server
+        return SpotServerCreator(
+            client=self.ecs_client,
+            region_id=settings.region_id,
+            resource_group_id=self._resource_group_id(),
+            included_automation_tag=dev_server_creation_settings.included_automation_tag,
+            instance_identifier_tag=dev_server_creation_settings.instance_identifier_tag(),
+        )
+
+    def _fetch_resource_group_id(self) -> str:
+        return self.resource_manager_client.resource_group_id()
+
+    def _describe_network(self) -> tuple[str, List[VSwitchInfo], SecurityGroupInfo]:
+        vpc, vswitches, security_group = self.vpc_client.describe_network()
+        return typing.cast(str, vpc.vpc_id), vswitches, security_group
+
+    def _describe_snapshot(self) -> SnapshotInfo:
+        return self.snapshot_client.describe_latest_matched_snapshot("data")
+
+    def _describe_images(self, region_id: str, image_name: str) -> List[ImageInfo]:
+        images = self.describe_cache.get_or_fetch(
+            DescribeCache.key("DescribeImages", region_id, image_name),
+            _images_cache_ttl,
+            DescribeImagesResponseBody,
+            lambda: self.ecs_client.describe_images(
+                DescribeImagesRequest(region_id=region_id, image_name=image_name)
+            ).body,
+        )
+        return images.images.image
+
+    def _describe_image(self) -> ImageInfo:
+        image_name_pattern = (
+            self.settings.spot_instance_creation.dev_server.image_name_pattern
+        )
+        # A pinned image ID can be used as is without describing images
+        if _image_id_re.match(image_name_pattern):
+            _log.debug("image name pattern is an image ID, use it directly.")
+            return ImageInfo(image_id=image_name_pattern)
+
+        # Retrieve the image matching the configured pattern
+        images = self._describe_images(self.settings.region_id, image_name_pattern)
+        # Guarded so the image names are only collected when debug logging is enabled
+        if _log.is_enabled_for(logging.DEBUG):
+            _log.debug(
+                "found %i images, use the first (newest).",
+                len(images),
+                images=[image.image_name for image in images],
+            )
+        return images[0]
+
+    def _iter_instance_types(self) -> Iterator[InstanceTypeInfo]:
+        server_settings = self.settings.spot_instance_creation.dev_server
+        key = DescribeCache.key(
+            "DescribeInstanceTypes",
+            self.settings.region_id,
+            server_settings.cpu_count_range,
+            server_settings.memory_size_range,
+        )
+
+        cached = self.describe_cache.get(
+            key, _instance_types_cache_ttl, DescribeInstanceTypesResponseBody
+        )
+        if cached is not None:
+            instance_types = cached.instance_types.instance_type
+            yield from instance_types
+        else:
+            instance_types = []
+            for instance_type in iter_instance_types(
+                self.ecs_client,
+                DescribeInstanceTypesRequest(
+                    minimum_cpu_core_count=server_settings.cpu_count_range[0],
+                    maximum_cpu_core_count=server_settings.cpu_count_range[1],
+                    minimum_memory_size=server_settings.memory_size_range[0],
+                    maximum_memory_size=server_settings.memory_size_range[1],
+                ),
+            ):
+                instance_types.append(instance_type)
+                yield instance_type
+            self.describe_cache.put(
+                key,
+                DescribeInstanceTypesResponseBody(
+                    instance_types=DescribeInstanceTypesResponseBodyInstanceTypes(
+                        instance_type=instance_types
+                    )
+                ),
+            )
+
+        if _log.is_enabled_for(logging.DEBUG):
+            _log.debug(
+                "%i instance types satisfied the range requirements: ",
+                len(instance_types),
+                instance_type_ids=[it.instance_type_id for it in instance_types],
+            )
 
     def select_instance_type(self) -> InstanceTypeZonePrice:
         settings = self.settings
+        dev_server_creation_settings = settings.spot_instance_creation.dev_server
         ecs_client = self.ecs_client
+        # Overlap the launch resource lookups with the price fetching and user selection
+        self._prefetch_launch_resources()
         # _log = self.
         region_id = self.settings.region_id
-        dev_server_creation_settings = self.settings.spot_instance_creation.dev_server
         _log.debug("current settings:", extra=settings)
 
         # debug.describe_instance_type_families(client, region_id)
 
         # debug.measure_describe_instance_types_time(client)
 
-        # Retrieve instance types matching the configured cpu and memory range requirements
-        server_settings = dev_server_creation_settings
-        instance_types = ecs_client.describe_instance_types(
-            DescribeInstanceTypesRequest(
-                minimum_cpu_core_count=server_settings.cpu_count_range[0],
-                maximum_cpu_core_count=server_settings.cpu_count_range[1],
-                minimum_memory_size=server_settings.memory_size_range[0],
-                maximum_memory_size=server_settings.memory_size_range[1],
+        # Instance types matching the configured cpu and memory range requirements
+        # are priced as they stream in
+        instance_types = self._iter_instance_types()
+
+        # Only the checklisted instance types are priced when a checklist is configured
+        checklist = dev_server_creation_settings.instance_types_checklist
+        if checklist:
+            _log.debug(
+                "pricing only the %i checklisted instance types.",
+                len(checklist),
+                instance_types_checklist=checklist,
+            )
+            allowed_instance_types = set(checklist)
+            instance_types = (
+                it
+                for it in instance_types
+                if it.instance_type_id in allowed_instance_types
             )
-        )
-        instance_types = instance_types.body.instance_types.instance_type
-        _log.debug(
-            "%i instance types satisfied the range requirements: ",
-            len(instance_types),
-            instance_type_ids=[it.instance_type_id for it in instance_types],
-        )
 
         prices = batch_describe_price(
             ecs_client,
             region_id,
             instance_types,
+            describe_cache=self.describe_cache,
+            top_k=dev_server_creation_settings.max_listed_servers,
+            fast_price=settings.fast_price,
         )
 
         # Select target instance type to create
@@ -62,6 +279,17 @@ class Engine:
         spot_server_selector.display_servers(prices)
         server_selected = spot_server_selector.select_server(prices)
         server_selected = prices[server_selected]
+        if server_selected.estimated:
+            # The system disk category of an estimated price is unknown, so the
+            # instance type is priced for real before launching it
+            server_selected = describe_exact_price(
+                ecs_client, region_id, server_selected
+            )
+            _log.info(
+                "priced the selected server: %.3f, %s",
+                server_selected.price.trade_price,
+                server_selected.disk_category,
+            )
         _log.debug(
             "selected server: %s, %s",
             server_selected.instance_type.instance_type_id,
@@ -71,92 +299,40 @@ class Engine:
         return server_selected
 
     def relaunch_dev_server(self, server_selected: InstanceTypeZonePrice):
-        settings = self.settings
-        client = self.ecs_client
-        dev_server_creation_settings = settings.spot_instance_creation.dev_server
-
-        # Retrieve the vswitch matching the configured pattern
-        access_key_id = settings.access_key_id
-        access_key_secret = settings.access_key_secret
-        resource_group_name = dev_server_creation_settings.resource_group_name
-        resource_manager_client = ResourceManagerClient(
-            access_key_id, access_key_secret.get_secret_value(), resource_group_name
-        )
-        resource_group_id = resource_manager_client.resource_group_id()
-
-        included_automation_tag = dev_server_creation_settings.included_automation_tag
-        excluded_automation_tag = dev_server_creation_settings.excluded_automation_tag
-        vpc_client = VPCClient(
-            access_key_id,
-            access_key_secret.get_secret_value(),
-            settings.region_id,
-            resource_group_id,
-            included_automation_tag,
-            excluded_automation_tag,
-        )
-
-        vpc = vpc_client.describe_matched_vpc()
-        vpc_id = typing.cast(str, vpc.vpc_id)
-        vswitch = vpc_client.get_suitable_vswitch(server_selected.zone_id, vpc_id)
-        security_group = vpc_client.describe_security_group(vpc_id)
+        dev_server_creation_settings = self.settings.spot_instance_creation.dev_server
 
-        # Retrieve the image matching the configured pattern
-        images = client.describe_images(
-            DescribeImagesRequest(
-                region_id=settings.region_id,
-                image_name=dev_server_creation_settings.image_name_pattern,
-            )
-        )
-        images = images.body.images.image
-        image = images[0]
-        _log.debug(
-            "found %i images, use the first (newest).",
-            len(images),
-            images=[image.image_name for image in images],
+        # Resolved in the background while the user was selecting the server
+        self._prefetch_launch_resources()
+        vpc_id, vswitches, security_group = typing.cast(
+            Future[tuple[str, List[VSwitchInfo], SecurityGroupInfo]],
+            self._network_future,
+        ).result()
+        vswitch = self.vpc_client.get_suitable_vswitch(
+            server_selected.zone_id, vpc_id, vswitches
         )
+        image = typing.cast(Future[ImageInfo], self._image_future).result()
+        snapshot = typing.cast(Future[SnapshotInfo], self._snapshot_future).result()
 
-        # Retrieve the matched data disk snapshot
-        instance_identifier_tag = dev_server_creation_settings.instance_identifier_tag()
-        dev_data_snapshot_content_identifier_tag = (
-            dev_server_creation_settings.dev_data_snapshot_content_identifier_tag()
-        )
         disk_to_snapshot_tag = dev_server_creation_settings.disk_to_snapshot_tag()
 
-        snapshot_client = SnapshotClient(
-            client,
-            region_id=settings.region_id,
-            resource_group_id=resource_group_id,
-            included_automation_tag=included_automation_tag,
-            dev_data_snapshot_identifier_tag=dev_data_snapshot_content_identifier_tag,
-            settings=dev_server_creation_settings ,
-        )
-
-        snapshot = snapshot_client.describe_latest_matched_snapshot("data")
-
-        spot_server_creator = SpotServerCreator(
-            client=client,
-            region_id=settings.region_id,
-            resource_group_id=resource_group_id,
-            included_automation_tag=included_automation_tag,
-            instance_identifier_tag=instance_identifier_tag,
-        )
-
         vswitch_id = typing.cast(str, vswitch.v_switch_id)
         image_id = typing.cast(str, image.image_id)
         snapshot_id = typing.cast(str, snapshot.snapshot_id)
         security_group_id = typing.cast(str, security_group.security_group_id)
+        # Estimated prices are priced for real once selected
+        disk_category = typing.cast(str, server_selected.disk_category)
 
         # Create instance
         _log.debug("creating instance...")
 
-        created_instance_ids = spot_server_creator.create_server(
+        created_instance_ids = self.spot_server_creator.create_server(
             vswitch_id=vswitch_id,
             instance_type_id=server_selected.instance_type_id,
             image_id=image_id,
             system_disk_size=20,
-            system_disk_category=server_selected.disk_category,
+            system_disk_category=disk_category,
             data_disk_size=20,
-            data_disk_category=server_selected.disk_category,
+            data_disk_category=disk_category,
             data_disk_snapshot_id=snapshot_id,
             security_group_id=security_group_id,
             instance_name=dev_server_creation_settings.instance_identifier,
@@ -164,39 +340,41 @@ class Engine:
             # dry_run=True,
         )
 
-        assert len(created_instance_ids) == 1
-
-        import time
+        if len(created_instance_ids) != 1:
+            raise RuntimeError(
+                f"Exactly one instance is expected to be created, but got {created_instance_ids}"
+            )
 
-        # Wait for disks to be created with retry mechanism
-        max_retries = 15
-        retry_delay = 0.8
-        block_storage_client = BlockStorageClient(
-            client, settings.region_id, resource_group_id
-        )
+        # Wait for disks to be created, polling with exponential backoff and jitter
+        block_storage_client = self.block_storage_client
+        deadline = time.monotonic() + _disk_poll_timeout
+        retry_delay = _disk_poll_initial_delay
+        attempt = 0
 
-        created_disks = None
-        for attempt in range(max_retries):
+        while True:
+            attempt += 1
             created_disks = block_storage_client.describe_disks(created_instance_ids[0])
             if len(created_disks) >= 2:  # Expecting at least 2 disks (system + data)
                 break
+            delay = min(retry_delay + random.uniform(0, 0.1), _disk_poll_max_delay)
+            if time.monotonic() + delay > deadline:
+                raise RuntimeError(
+                    f"Failed to retrieve disks after {attempt} attempts ({_disk_poll_timeout}s)"
+                )
             _log.debug(
-                f"Disks not ready yet, retrying in {retry_delay}s... (attempt {attempt + 1}/{max_retries})"
+                f"Disks not ready yet, retrying in {delay:.2f}s... (attempt {attempt})"
             )
-            time.sleep(retry_delay)
-
-        if created_disks is None or len(created_disks) < 2:
-            raise RuntimeError(f"Failed to retrieve disks after {max_retries} attempts")
+            time.sleep(delay)
+            retry_delay *= _disk_poll_backoff
 
-        assert len(created_disks) == 2
+        disks = block_storage_client.split_disks(created_disks)
+        if len(disks.data) != 1:
+            raise RuntimeError(
+                f"Exactly one data disk is expected, but {len(disks.data)} were found"
+            )
 
-        data_disks = block_storage_client.filter_disk_by_disk_type(
-            created_disks, "data"
+        # Enable performance bursting for created disks if suitable, and tag the data disk
+        # using the data disk identifier for future identification (when disk to snapshot)
+        block_storage_client.finalize_disks(
+            disks.all(), bursting=True, tag=disk_to_snapshot_tag
         )
-        assert len(data_disks) == 1
-
-        # enable performance bursting for created disks if suitable
-        block_storage_client.toggle_bursting(created_disks, True)
-
-        # Tag the data disk using the data disk identifier for future identification (when disk to snapshot)
-        block_storage_client.tag_data_disks(created_disks, disk_to_snapshot_tag)
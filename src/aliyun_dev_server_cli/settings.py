@@ -1,6 +1,16 @@
+from functools import cache, cached_property
+import hashlib
 import pathlib
 import re
-from typing import Annotated, List, LiteralString, Optional, Tuple, override
+from typing import (
+    TYPE_CHECKING,
+    Annotated,
+    List,
+    LiteralString,
+    Optional,
+    Tuple,
+    override,
+)
 from pydantic import (
     AfterValidator,
     BaseModel,
@@ -11,18 +21,39 @@ from pydantic import (
 )
 from pydantic_settings import (
     BaseSettings,
+    CliImplicitFlag,
     PydanticBaseSettingsSource,
     SettingsConfigDict,
     TomlConfigSettingsSource,
 )
 
-from .aliyun import Config, Client
+if TYPE_CHECKING:
+    from alibabacloud_ecs20140526.client import Client
+    from alibabacloud_vpc20160428.client import Client as VPCClient
+    from alibabacloud_tea_openapi.models import Config
+
 from .types import SingleKeyDict, get_tag_from_single_key_dict
 
 __home_dir = pathlib.Path.home()
 _config_file = __home_dir / ".config" / "aliyun-dev-server-cli.config.toml"
 __local_config_file = pathlib.Path("config.toml")
 _config_files = [_config_file, __local_config_file]
+# Size of the HTTP connection pool per endpoint, covering the concurrent API calls
+_max_idle_conns = 32
+# Timeouts of Aliyun API calls in milliseconds; a stalled connection fails fast
+# instead of blocking the launch
+_connect_timeout = 3000
+_read_timeout = 10000
+# Attempts per Aliyun API call, including the first one, when throttled
+_max_attempts = 3
+# Error codes the request was rejected with before being processed, which makes
+# retrying safe even for non-idempotent calls such as RunInstances
+_retryable_error_codes = [
+    "Throttling",
+    "Throttling.User",
+    "Throttling.Api",
+    "ServiceUnavailable",
+]
 
 
 def validate_cpu_range(v: Tuple[int, int]):
@@ -45,12 +76,14 @@ MemoryGiBRange = Annotated[
 ]
 
 
-class DevServerCreationSettings(BaseModel):
+class DevServerCreationSettings(BaseModel, frozen=True):
     image_name_pattern: str
     cpu_count_range: CPUCountRange = (16, 32)
     memory_size_range: MemoryGiBRange = (16, 32)
     # Convenient instance type checklist to accelerate price fetching
     instance_types_checklist: Optional[List[str]] = None
+    # Number of the cheapest spot servers listed for selection, all if unset
+    max_listed_servers: Optional[PositiveInt] = 30
     resource_group_name: str = "dev-resource-group"
     included_automation_tag: SingleKeyDict = {"nysparis:automation-usage": "dev"}
     excluded_automation_tag: SingleKeyDict = {"nysparis:automation-usage": "none"}
@@ -84,12 +117,15 @@ class DevServerCreationSettings(BaseModel):
             return {self._snapshot_content_identifier_tag: value}
 
 
-class SpotInstanceCreationSettings(BaseModel):
+class SpotInstanceCreationSettings(BaseModel, frozen=True):
     dev_server: DevServerCreationSettings
 
 
 class Settings(BaseSettings, extra="allow"):
-    model_config = SettingsConfigDict(env_file=".env", cli_parse_args=True)
+    # Settings are read-only once loaded, so derived values can be cached safely
+    model_config = SettingsConfigDict(
+        env_file=".env", cli_parse_args=True, frozen=True
+    )
 
     access_key_id: str
     access_key_secret: SecretStr
@@ -97,13 +133,66 @@ class Settings(BaseSettings, extra="allow"):
 
     spot_instance_creation: SpotInstanceCreationSettings
 
-    def get_aliyun_client(self) -> Client:
-        config = Config(
+    # Bypass the on-disk describe cache and refetch everything from Aliyun
+    refresh_cache: CliImplicitFlag[bool] = False
+    # Estimate prices from the smallest instance type of each family, trading
+    # accuracy for far fewer DescribePrice calls
+    fast_price: CliImplicitFlag[bool] = False
+
+    @cached_property
+    def cache_scope(self) -> str:
+        """Hash of the account and region the describe cache entries are scoped to."""
+        raw = f"{self.access_key_id}|{self.region_id}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+    @cached_property
+    def aliyun_config(self) -> "Config":
+        """The Config shared by every Aliyun client."""
+        # Deferred so that loading and validating settings doesn't import the SDK
+        from alibabacloud_tea_openapi.models import Config
+        from darabonba.policy.retry import RetryCondition, RetryOptions
+
+        return Config(
             access_key_id=self.access_key_id,
             access_key_secret=self.access_key_secret.get_secret_value(),
             region_id=self.region_id,
+            # Pooled connections are shared by concurrent calls (e.g. price fetching)
+            max_idle_conns=_max_idle_conns,
+            connect_timeout=_connect_timeout,
+            read_timeout=_read_timeout,
+            # Retried on the pooled connection, with exponential backoff and jitter
+            retry_options=RetryOptions(
+                retryable=True,
+                retryCondition=[
+                    RetryCondition(
+                        maxAttempts=_max_attempts,
+                        exception=["ThrottlingException"],
+                        errorCode=_retryable_error_codes,
+                        backoff={"policy": "ExponentialWithEqualJitter", "period": 200},
+                    )
+                ],
+            ),
         )
-        return Client(config)
+
+    @cached_property
+    def aliyun_client(self) -> "Client":
+        """The ECS client shared by every component."""
+        from alibabacloud_ecs20140526.client import Client
+
+        return Client(self.aliyun_config)
+
+    @cached_property
+    def vpc_client(self) -> "VPCClient":
+        """The VPC client shared by every component."""
+        from alibabacloud_vpc20160428.client import Client as VPCClient
+
+        return VPCClient(self.aliyun_config)
+
+    def get_aliyun_client(self) -> "Client":
+        return self.aliyun_client
+
+    def get_vpc_client(self) -> "VPCClient":
+        return self.vpc_client
 
     @override
     @classmethod
@@ -133,3 +222,9 @@ class Settings(BaseSettings, extra="allow"):
     @staticmethod
     def new():
         return Settings()  # pyright: ignore
+
+
+@cache
+def get_settings() -> Settings:
+    """Load the settings once, sharing them and their clients within the process."""
+    return Settings.new()
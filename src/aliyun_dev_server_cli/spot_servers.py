@@ -1,18 +1,19 @@
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-import select
-from typing import Annotated, List, Tuple
+import heapq
+import logging
+from collections.abc import Callable
+from typing import Annotated, Iterable, Iterator, List
 import typing
-import inquirer
-import inquirer.errors
 from pydantic import BaseModel, Field
 from alibabacloud_ecs20140526.models import (
     DescribeAvailableResourceResponseBodyAvailableZonesAvailableZone,
     DescribeAvailableResourceRequest,
+    DescribeAvailableResourceResponseBody,
+    DescribeInstanceTypesRequest,
     DescribePriceRequestSystemDisk,
     DescribePriceRequest,
-    DescribePriceResponse,
-    DescribePriceResponseBodyPriceInfoPrice,
+    DescribePriceResponseBodyPriceInfoPrice as PriceInfo,
     DescribeInstanceTypesResponseBodyInstanceTypesInstanceType as InstanceTypeInfo,
     RunInstancesRequest,
     RunInstancesRequestDataDisk,
@@ -22,19 +23,21 @@ from alibabacloud_ecs20140526.models import (
 from rich.columns import Columns
 from rich.console import Console
 from rich.panel import Panel
-from rich.pretty import pprint
 from rich.rule import Rule
+from rich.markup import escape
 from rich.text import Text
 import structlog
-from itertools import chain
-from rich.style import Style
 
 from .aliyun import Client, ClientException
+from .cache import DescribeCache
 from .types import SingleKeyDict, get_tag_from_single_key_dict
 
 
 _log = structlog.get_logger(__name__)
 
+# Zone availability of instance types changes on the order of hours
+_available_resource_cache_ttl = 6 * 60 * 60
+
 
 InstanceTypeID = Annotated[str, Field(description="Instance type ID")]
 ZoneID = Annotated[str, Field(description="Zone ID")]
@@ -43,21 +46,209 @@ ZoneID = Annotated[str, Field(description="Zone ID")]
 class InstanceTypeZonePrice(BaseModel, arbitrary_types_allowed=True):
     instance_type_id: InstanceTypeID
     zone_id: ZoneID
-    price: DescribePriceResponseBodyPriceInfoPrice
+    price: PriceInfo
     instance_type: InstanceTypeInfo
-    disk_category: str
+    # None for prices estimated from another size of the family, whose supported
+    # system disk category is unknown until priced for real
+    disk_category: str | None = None
+
+    @property
+    def estimated(self) -> bool:
+        return self.disk_category is None
+
+
+def _trade_price(price: InstanceTypeZonePrice) -> float:
+    return price.price.trade_price or 0
+
+
+def _instance_type_family(instance_type: InstanceTypeInfo) -> str:
+    instance_type_id = typing.cast(str, instance_type.instance_type_id)
+    return instance_type.instance_type_family or instance_type_id.rpartition(".")[0]
+
+
+def _scale_price(price: PriceInfo, factor: float) -> PriceInfo:
+    def scale(value: float | None) -> float | None:
+        return None if value is None else value * factor
+
+    return PriceInfo(
+        currency=price.currency,
+        original_price=scale(price.original_price),
+        discount_price=scale(price.discount_price),
+        trade_price=scale(price.trade_price),
+    )
+
+
+def _is_unsupported_system_disk_category(err: object) -> bool:
+    return (
+        isinstance(err, ClientException)
+        and (err.data or {}).get("Code")
+        == "InvalidSystemDiskCategory.ValueNotSupported"
+    )
+
+
+_system_disk_args = [
+    DescribePriceRequestSystemDisk(category=system_disk_str)
+    for system_disk_str in [
+        "cloud_auto",
+        "cloud_efficiency",
+        "cloud_essd",
+        "cloud_essd_entry",
+        "cloud_ssd",
+        "ephemeral_ssd",
+    ]
+]
+
+
+def _probe_price(
+    client_describe_price: Callable[[DescribePriceRequest], typing.Any],
+    region_id: str,
+    instance_type: InstanceTypeInfo,
+    zone_id: ZoneID,
+    unsupported_categories: set[str],
+    debug_enabled: bool,
+) -> InstanceTypeZonePrice | Exception:
+    instance_type_id = typing.cast(str, instance_type.instance_type_id)
+    # Categories known to be rejected are tried last, except cloud_auto. The sort
+    # is stable, so the preference order is kept otherwise
+    candidate_system_disk_args = sorted(
+        _system_disk_args,
+        key=lambda arg: arg is not _system_disk_args[0]
+        and arg.category in unsupported_categories,
+    )
+
+    if debug_enabled:
+        _log.debug(
+            "describe_price:",
+            zone_id=zone_id,
+            region_id=region_id,
+            instance_type_id=instance_type_id,
+        )
+
+    error = None
+
+    # Probe the system disk categories until one is supported by the instance type
+    for system_disk_arg in candidate_system_disk_args:
+        try:
+            result = client_describe_price(
+                DescribePriceRequest(
+                    resource_type="Instance",
+                    instance_type=instance_type_id,
+                    region_id=region_id,
+                    zone_id=zone_id,
+                    system_disk=system_disk_arg,
+                    spot_strategy="SpotAsPriceGo",
+                )
+            )
+        except Exception as err:
+            if _is_unsupported_system_disk_category(err):
+                unsupported_categories.add(typing.cast(str, system_disk_arg.category))
+            error = err
+            continue
+
+        if debug_enabled:
+            _log.debug(
+                "describe_price done:",
+                zone_id=zone_id,
+                region_id=region_id,
+                instance_type_id=instance_type_id,
+                system_disk=system_disk_arg.category,
+            )
+        return InstanceTypeZonePrice(
+            instance_type_id=instance_type_id,
+            zone_id=zone_id,
+            price=result.body.price_info.price,
+            instance_type=instance_type,
+            disk_category=typing.cast(str, system_disk_arg.category),
+        )
+
+    return error or Exception("this should not happen")
+
+
+def describe_exact_price(
+    client: Client, region_id: str, price: InstanceTypeZonePrice
+) -> InstanceTypeZonePrice:
+    """Price an instance type in its zone for real, probing its system disk category.
+
+    Used for prices estimated in fast price mode, which don't carry the system
+    disk category supported by the instance type.
+
+    Args:
+        client: Alibaba Cloud ECS client instance
+        region_id: The region of the zone
+        price: The (estimated) price of the instance type in a zone
+
+    Returns:
+        The actual price of the instance type in the zone
+
+    Raises:
+        Exception: If the instance type can't be priced with any system disk category
+    """
+    result = _probe_price(
+        client.describe_price,
+        region_id,
+        price.instance_type,
+        price.zone_id,
+        set(),
+        _log.is_enabled_for(logging.DEBUG),
+    )
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def iter_instance_types(
+    client: Client, request: DescribeInstanceTypesRequest
+) -> Iterator[InstanceTypeInfo]:
+    """Iterate the instance types matching a request, fetching pages lazily.
+
+    Args:
+        client: Alibaba Cloud ECS client instance
+        request: Request describing the instance types, its next_token is updated
+            while paging
+
+    Yields:
+        Instance types in the order returned by the API
+    """
+    while True:
+        body = client.describe_instance_types(request).body
+        instance_types = body.instance_types.instance_type
+        _log.debug("fetched a page of %i instance types.", len(instance_types))
+        yield from instance_types
+        if not body.next_token:
+            break
+        request.next_token = body.next_token
 
 
 def batch_describe_price(
-    client: Client, region_id: str, instance_types: List[InstanceTypeInfo]
+    client: Client,
+    region_id: str,
+    instance_types: Iterable[InstanceTypeInfo],
+    max_concurrency: int = 24,
+    describe_cache: DescribeCache | None = None,
+    top_k: int | None = None,
+    fast_price: bool = False,
 ) -> List[InstanceTypeZonePrice]:
-    zones = client.describe_available_resource(
-        DescribeAvailableResourceRequest(
-            region_id=region_id,
-            destination_resource="InstanceType",
-            spot_strategy="SpotAsPriceGo",
+    def describe_available_resource() -> DescribeAvailableResourceResponseBody:
+        return client.describe_available_resource(
+            DescribeAvailableResourceRequest(
+                region_id=region_id,
+                destination_resource="InstanceType",
+                spot_strategy="SpotAsPriceGo",
+            )
+        ).body
+
+    if describe_cache is None:
+        available_resource = describe_available_resource()
+    else:
+        available_resource = describe_cache.get_or_fetch(
+            DescribeCache.key(
+                "DescribeAvailableResource", region_id, "InstanceType", "SpotAsPriceGo"
+            ),
+            _available_resource_cache_ttl,
+            DescribeAvailableResourceResponseBody,
+            describe_available_resource,
         )
-    ).body.available_zones.available_zone
+    zones = available_resource.available_zones.available_zone
 
     def get_instance_types_available_in_zone(
         zone: DescribeAvailableResourceResponseBodyAvailableZonesAvailableZone,
@@ -73,164 +264,196 @@ def batch_describe_price(
         )
         return set(available_instance_types)
 
-    instance_type_available_in_zones = [
-        (typing.cast(str, zone.zone_id), get_instance_types_available_in_zone(zone))
-        for zone in zones
-    ]
-
-    instance_type_zone_pairs = [
-        [
-            (it, zone_id)
-            for it in instance_types
-            if it.instance_type_id in instance_types_available
-        ]
-        for (zone_id, instance_types_available) in instance_type_available_in_zones
-    ]
-
-    # --- debug ---
-    # pprint(instance_type_zone_pairs)
-    # -------------
-
-    instance_type_zone_pairs = list(chain.from_iterable(instance_type_zone_pairs))
-
-    # --- debug ---
-    # pprint(instance_type_zone_pairs)
-    # pprint(len(instance_type_zone_pairs))
-    # -------------
-
-    system_disk_args = [
-        DescribePriceRequestSystemDisk(category=system_disk_str)
-        for system_disk_str in [
-            "cloud_auto",
-            "cloud_efficiency",
-            "cloud_essd",
-            "cloud_essd_entry",
-            "cloud_ssd",
-            "ephemeral_ssd",
-        ]
-    ]
-
-    def describe_price_in_thread(
+    # Inverted once so each streamed instance type finds its zones with one lookup
+    zone_ids_by_instance_type: dict[InstanceTypeID, List[ZoneID]] = {}
+    for zone in zones:
+        zone_id = typing.cast(str, zone.zone_id)
+        for instance_type_id in get_instance_types_available_in_zone(zone):
+            zone_ids_by_instance_type.setdefault(instance_type_id, []).append(zone_id)
+
+    # Instance types of a family generally reject the same system disk categories
+    # in a zone, so the categories rejected once are only retried as a last resort.
+    # cloud_auto is always tried first, its support varies between the sizes of a
+    # family and it is the only category which enables bursting.
+    unsupported_categories_by_family: dict[tuple[ZoneID, str], set[str]] = {}
+
+    # Bound once, describe_price runs for every (instance type, zone) pair and
+    # system disk category
+    client_describe_price = client.describe_price
+    debug_enabled = _log.is_enabled_for(logging.DEBUG)
+
+    def describe_price(
         instance_type: InstanceTypeInfo, zone_id: ZoneID
     ) -> InstanceTypeZonePrice | Exception:
-        instance_type_id = typing.cast(str, instance_type.instance_type_id)
+        family_key = (zone_id, _instance_type_family(instance_type))
+        return _probe_price(
+            client_describe_price,
+            region_id,
+            instance_type,
+            zone_id,
+            unsupported_categories_by_family.setdefault(family_key, set()),
+            debug_enabled,
+        )
 
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    async def describe_price_async(
+        semaphore: asyncio.Semaphore,
+        executor: ThreadPoolExecutor,
+        instance_type: InstanceTypeInfo,
+        zone_id: ZoneID,
+    ) -> InstanceTypeZonePrice | Exception:
+        # The SDK client is blocking, run it in worker threads so the IO overlaps
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                executor, describe_price, instance_type, zone_id
+            )
 
-        def run():
-            def describe_price_async() -> (
-                Tuple[DescribePriceResponse, DescribePriceRequestSystemDisk] | Exception
-            ):
-                _log.debug(
-                    "describe_price_async:",
-                    zone_id=zone_id,
-                    region_id=region_id,
-                    instance_type_id=instance_type_id,
+    async def describe_prices(
+        instance_type_zones: Iterable[tuple[InstanceTypeInfo, Iterable[ZoneID]]],
+    ) -> List[InstanceTypeZonePrice | Exception]:
+        semaphore = asyncio.Semaphore(max_concurrency)
+        loop = asyncio.get_running_loop()
+        instance_type_zones_iter = iter(instance_type_zones)
+        tasks = []
+        # One extra worker pulls instance types, which may block on fetching the next page
+        with ThreadPoolExecutor(max_workers=max_concurrency + 1) as executor:
+            # Start pricing each instance type as soon as it arrives instead of
+            # waiting for the whole catalogue
+            while (
+                item := await loop.run_in_executor(
+                    executor, next, instance_type_zones_iter, None
+                )
+            ) is not None:
+                instance_type, zone_ids = item
+                tasks.extend(
+                    asyncio.ensure_future(
+                        describe_price_async(semaphore, executor, instance_type, zone_id)
+                    )
+                    for zone_id in zone_ids
                 )
+            return await asyncio.gather(*tasks)
 
-                error = None
-
-                for system_disk_arg in system_disk_args:
-                    try:
-                        result = client.describe_price(
-                            DescribePriceRequest(
-                                resource_type="Instance",
-                                instance_type=instance_type_id,
-                                region_id=region_id,
-                                zone_id=zone_id,
-                                system_disk=system_disk_arg,
-                                spot_strategy="SpotAsPriceGo",
-                            )
-                        )
-                        _log.debug(
-                            "describe_price_async done:",
-                            zone_id=zone_id,
-                            region_id=region_id,
-                            instance_type_id=instance_type_id,
-                            system_disk=system_disk_arg.category,
-                        )
-                        return (result, system_disk_arg)
-                    except Exception as err:
-                        error = err
-                        continue
-                return error or Exception("this should not happen")
-
-            result = describe_price_async()
-            if isinstance(result, Exception):
-                return result
-
-            price_info = InstanceTypeZonePrice(
-                instance_type_id=instance_type_id,
-                zone_id=zone_id,
-                price=result[0].body.price_info.price,
-                instance_type=instance_type,
-                disk_category=typing.cast(str, result[1].category),
+    unavailable_instance_type_ids: List[InstanceTypeID] = []
+
+    def zone_ids_of(instance_type: InstanceTypeInfo) -> Iterable[ZoneID]:
+        instance_type_id = typing.cast(str, instance_type.instance_type_id)
+        zone_ids = zone_ids_by_instance_type.get(instance_type_id)
+        if zone_ids is None:
+            unavailable_instance_type_ids.append(instance_type_id)
+            return ()
+        return zone_ids
+
+    if not fast_price:
+        prices = asyncio.run(
+            describe_prices((it, zone_ids_of(it)) for it in instance_types)
+        )
+    else:
+        # Only the smallest instance type of each family is priced per zone, the
+        # prices of the other sizes are scaled by their CPU core count
+        families: dict[tuple[str, ZoneID], List[InstanceTypeInfo]] = {}
+        for instance_type in instance_types:
+            family = _instance_type_family(instance_type)
+            for zone_id in zone_ids_of(instance_type):
+                families.setdefault((family, zone_id), []).append(instance_type)
+        representatives = {
+            key: min(members, key=lambda it: it.cpu_core_count or 0)
+            for key, members in families.items()
+        }
+        representative_prices = asyncio.run(
+            describe_prices(
+                (representative, [zone_id])
+                for (_, zone_id), representative in representatives.items()
             )
+        )
 
-            return price_info
+        prices = []
+        for key, representative_price in zip(representatives, representative_prices):
+            if isinstance(representative_price, Exception):
+                prices.append(representative_price)
+                continue
+            representative_cpu_count = representatives[key].cpu_core_count or 1
+            prices.extend(
+                representative_price
+                if member is representatives[key]
+                else representative_price.model_copy(
+                    update={
+                        "instance_type_id": member.instance_type_id,
+                        "instance_type": member,
+                        "disk_category": None,
+                        "price": _scale_price(
+                            representative_price.price,
+                            (member.cpu_core_count or 0) / representative_cpu_count,
+                        ),
+                    }
+                )
+                for member in families[key]
+            )
+        _log.debug(
+            "priced %i instance type families to estimate %i prices.",
+            len(representatives),
+            len(prices),
+        )
 
-        result = run()
-        return result
+    _log.debug("all prices collected.")
 
-    with ThreadPoolExecutor(max_workers=24) as executor:
-        futures = [
-            executor.submit(describe_price_in_thread, instance_type, zone_id)
-            for (instance_type, zone_id) in instance_type_zone_pairs
-        ]
+    if unavailable_instance_type_ids:
+        _log.info(
+            "%i instance types are not available as spot instances in any zone, "
+            "consider narrowing the cpu count and memory size ranges.",
+            len(unavailable_instance_type_ids),
+            instance_type_ids=unavailable_instance_type_ids[:10],
+        )
 
-        prices = [future.result() for future in futures]
-        _log.debug("all futures collected.")
+    # Classify the results in a single pass
+    wrong_system_disk_count = 0
+    exceptions: List[Exception] = []
+    succeeded_prices: List[InstanceTypeZonePrice] = []
+    for price in prices:
+        if isinstance(price, InstanceTypeZonePrice):
+            succeeded_prices.append(price)
+        elif _is_unsupported_system_disk_category(price):
+            wrong_system_disk_count += 1
+        else:
+            exceptions.append(price)
 
-    wrong_system_disk_prices = [
-        price
-        for price in prices
-        if isinstance(price, ClientException)
-        and price.data["Code"] == "InvalidSystemDiskCategory.ValueNotSupported"
-    ]
-    wrong_len = len(wrong_system_disk_prices)
-    if wrong_len > 0:
+    if wrong_system_disk_count > 0:
         _log.debug(
             "found %i instance types with unsupported system disk category. Ignored them.",
-            wrong_len,
+            wrong_system_disk_count,
         )
 
-    prices = [price for price in prices if price not in wrong_system_disk_prices]
-
-    exceptions = [price for price in prices if isinstance(price, Exception)]
     wrong_len = len(exceptions)
     if wrong_len > 0:
         _log.error(
             "found %i instance prices with exceptions.",
             wrong_len,
         )
-        # raise all exceptions
+        # raise all exceptions, keeping their tracebacks
         if wrong_len == 1:
             raise exceptions[0]
         else:
-            # 创建一个包含所有原始异常信息的新异常
-            exception_messages = "\n".join(
-                [f"{type(e).__name__}: {str(e)}" for e in exceptions]
-            )
-            raise Exception(
-                f"Found {wrong_len} instance prices with exceptions:\n{exception_messages}"
+            raise ExceptionGroup(
+                f"Found {wrong_len} instance prices with exceptions", exceptions
             )
 
     _log.debug(
         "found %i instance prices.",
-        len(prices),
+        len(succeeded_prices),
     )
 
-    prices = typing.cast(List[InstanceTypeZonePrice], prices)
-    prices.sort(key=lambda p: p.price.trade_price or 0)
+    if top_k is None:
+        succeeded_prices.sort(key=_trade_price)
+    else:
+        # Only the cheapest ones are kept, no need to sort every price
+        succeeded_prices = heapq.nsmallest(top_k, succeeded_prices, key=_trade_price)
     _log.debug(
-        "minimum price: %s, maximum price: %s",
-        prices[0].price.trade_price,
-        prices[-1].price.trade_price,
+        "minimum price: %s, maximum kept price: %s",
+        succeeded_prices[0].price.trade_price,
+        succeeded_prices[-1].price.trade_price,
     )
 
     # Prices sorted ascending
-    return prices
+    return succeeded_prices
 
 
 class SpotServerSelector:
@@ -248,51 +471,26 @@ class SpotServerSelector:
         self.console.print(Rule(style="green"))
 
     def display_servers(self, servers: List[InstanceTypeZonePrice]):
-        green = Style(color="green")
-        purple = Style(color="bright_magenta")
-        yellow = Style(color="bright_yellow")
-
         panels = []
         for i, server in enumerate(servers):
-            content = Text(style=green)
+            instance_type = server.instance_type
+            cpu_turbo_freq = instance_type.cpu_turbo_frequency
+            turbo_style = "bright_yellow" if cpu_turbo_freq else "bright_magenta"
+            # Rendered from one markup string instead of a chain of appends
+            content = Text.from_markup(
+                f"cpu_count=[bright_yellow]{instance_type.cpu_core_count}[/] "
+                f"cpu_freq=[bright_magenta]{instance_type.cpu_speed_frequency}[/] "
+                f"cpu_turbo_freq=[{turbo_style}]{cpu_turbo_freq}[/] "
+                f"price=[bright_yellow]{'~' if server.estimated else ''}"
+                f"{server.price.trade_price:.3f}[/]\n"
+                f"memory_size=[bright_yellow]{instance_type.memory_size}[/] "
+                f"arch=[bright_yellow]{escape(str(instance_type.cpu_architecture))}[/] "
+                f"zone_id=[bright_magenta]{escape(server.zone_id)}[/] "
+                f"disk_category=[bright_yellow]{escape(server.disk_category or 'estimated')}[/]",
+                style="green",
+            )
             instance_type_id = server.instance_type_id
-            instance_category = server.instance_type.instance_category
-            cpu_count = server.instance_type.cpu_core_count
-            content.append("cpu_count=")
-            content.append(str(cpu_count), style=yellow)
-            content.append(" ")
-            cpu_freq = server.instance_type.cpu_speed_frequency
-            content.append("cpu_freq=")
-            content.append(str(cpu_freq), style=purple)
-            content.append(" ")
-            cpu_turbo_freq = server.instance_type.cpu_turbo_frequency
-            content.append("cpu_turbo_freq=")
-            style = purple
-            if cpu_turbo_freq:
-                style = yellow
-            content.append(str(cpu_turbo_freq), style=style)
-            price = server.price.trade_price
-            content.append(" ")
-            content.append("price=")
-            content.append(f"{price:.3f}", style=yellow)
-
-            content.append("\n")
-
-            memory_size = server.instance_type.memory_size
-            content.append("memory_size=")
-            content.append(str(memory_size), style=yellow)
-            arch = server.instance_type.cpu_architecture
-            content.append(" ")
-            content.append("arch=")
-            content.append(str(arch), style=yellow)
-            zone_id = server.zone_id
-            content.append(" ")
-            content.append("zone_id=")
-            content.append(str(zone_id), style=purple)
-            disk_category = server.disk_category
-            content.append(" ")
-            content.append("disk_category=")
-            content.append(str(disk_category), style=yellow)
+            instance_category = instance_type.instance_category
 
             panel = Panel(
                 content,
@@ -306,32 +504,26 @@ class SpotServerSelector:
         # self.console.print(self.select_prompt(len(servers)))
 
     def select_server(self, servers: List[InstanceTypeZonePrice]):
-        def validate_selection(_ans, v: str):
+        def validate_selection(v: str) -> str | None:
             try:
                 value = int(v)
             except ValueError:
-                raise inquirer.errors.ValidationError(
-                    "", reason="input must be an integer"
-                )
+                return "input must be an integer"
             if value <= -1 or value >= len(servers):
-                raise inquirer.errors.ValidationError(
-                    "", reason=f"input must be between 0 and {len(servers) - 1}"
-                )
-            return True
+                return f"input must be between 0 and {len(servers) - 1}"
+            return None
 
         self.print_rule()
 
-        message = str(self.select_prompt(len(servers)))
-        selected = inquirer.prompt(
-            [
-                inquirer.Text(
-                    "selected",
-                    message=message,
-                    validate=validate_selection,
-                )
-            ]
-        )
-        selected = int(typing.cast(dict[str, str], selected)["selected"])
+        prompt = self.select_prompt(len(servers))
+        prompt.append(f" [0-{len(servers) - 1}]: ")
+        while True:
+            answer = self.console.input(prompt).strip()
+            reason = validate_selection(answer)
+            if reason is None:
+                break
+            self.console.print(f">> {reason}", style="red")
+        selected = int(answer)
         self.print_rule()
         return selected
 
@@ -0,0 +1,89 @@
+"""Test script to verify disk finalization against a fake ECS client."""
+
+import threading
+from types import SimpleNamespace
+
+from alibabacloud_ecs20140526.models import DescribeDisksResponseBodyDisksDisk as DiskDescription
+import pytest
+from aliyun_dev_server_cli.aliyun import BlockStorageClient
+
+
+class _FakeClient:
+    def __init__(self):
+        self.modified = []
+        self.tagged = []
+        self._lock = threading.Lock()
+
+    def modify_disk_attribute(self, request):
+        with self._lock:
+            self.modified.append((request.disk_ids, request.bursting_enabled))
+        return SimpleNamespace(body=SimpleNamespace(request_id="request"))
+
+    def tag_resources(self, request):
+        with self._lock:
+            self.tagged.append((request.resource_id, [(t.key, t.value) for t in request.tag]))
+        return SimpleNamespace(body=SimpleNamespace(request_id="request"))
+
+
+def _disk(disk_id: str, type: str, category: str = "cloud_auto") -> DiskDescription:
+    return DiskDescription(disk_id=disk_id, type=type, category=category)
+
+
+def test_split_disks():
+    """Test that the system disk is split from the data disks."""
+    disks = BlockStorageClient.split_disks(
+        [_disk("d-1", "data"), _disk("d-0", "system"), _disk("d-2", "data")]
+    )
+
+    assert disks.system.disk_id == "d-0"
+    assert [disk.disk_id for disk in disks.data] == ["d-1", "d-2"]
+    assert [disk.disk_id for disk in disks.all()] == ["d-0", "d-1", "d-2"]
+
+
+def test_split_disks_requires_one_system_disk():
+    """Test that an instance without exactly one system disk is rejected."""
+    with pytest.raises(RuntimeError):
+        BlockStorageClient.split_disks([_disk("d-1", "data")])
+
+
+def test_partition_disks():
+    """Test that cloud-auto disks and data disks are collected in one pass."""
+    partition = BlockStorageClient.partition_disks(
+        [
+            _disk("d-0", "system"),
+            _disk("d-1", "data", category="cloud_essd"),
+            _disk("d-2", "data"),
+        ]
+    )
+
+    assert partition.cloud_auto_ids == ["d-0", "d-2"]
+    assert partition.data_disk_ids == ["d-1", "d-2"]
+
+
+def test_large_disk_lists_are_chunked():
+    """Test that disk IDs are split by the per-call caps."""
+    client = _FakeClient()
+    block_storage_client = BlockStorageClient(client, "region", "rg")
+    disk_ids = [f"d-{i}" for i in range(120)]
+
+    assert block_storage_client.set_bursting(disk_ids, True) == 120
+    assert block_storage_client.tag_disks(disk_ids, {"role": "dev"}) == 120
+
+    assert sorted(len(ids) for ids, _ in client.modified) == [20, 100]
+    assert sorted(len(ids) for ids, _ in client.tagged) == [20, 50, 50]
+
+
+def test_finalize_disks():
+    """Test that bursting is toggled on cloud-auto disks and data disks are tagged."""
+    client = _FakeClient()
+    block_storage_client = BlockStorageClient(client, "region", "rg")
+
+    result = block_storage_client.finalize_disks(
+        [_disk("d-0", "system"), _disk("d-1", "data", category="cloud_essd")],
+        bursting=False,
+        tag={"role": "dev"},
+    )
+
+    assert result == (1, 1)
+    assert client.modified == [(["d-0"], False)]
+    assert client.tagged == [(["d-1"], [("role", "dev")])]
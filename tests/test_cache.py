@@ -0,0 +1,63 @@
+"""Test script to verify that the describe cache honours its TTL."""
+
+import os
+
+from alibabacloud_ecs20140526.models import DescribeImagesResponseBody
+from aliyun_dev_server_cli.cache import DescribeCache
+
+
+def _images_body(image_id: str) -> DescribeImagesResponseBody:
+    return DescribeImagesResponseBody().from_map(
+        {"Images": {"Image": [{"ImageId": image_id}]}}
+    )
+
+
+def test_cached_body_is_reused(tmp_path):
+    """Test that a fresh entry is served without fetching again."""
+    cache = DescribeCache(cache_dir=tmp_path)
+    key = DescribeCache.key("DescribeImages", "cn-hangzhou", "*dev*")
+
+    first = cache.get_or_fetch(key, 60, DescribeImagesResponseBody, lambda: _images_body("m-1"))
+    second = cache.get_or_fetch(key, 60, DescribeImagesResponseBody, lambda: _images_body("m-2"))
+
+    assert first.images.image[0].image_id == "m-1"
+    assert second.images.image[0].image_id == "m-1"
+
+
+def test_expired_entry_is_refetched(tmp_path):
+    """Test that an entry older than the TTL is refetched."""
+    cache = DescribeCache(cache_dir=tmp_path)
+    key = DescribeCache.key("DescribeImages", "cn-hangzhou", "*dev*")
+
+    cache.get_or_fetch(key, 60, DescribeImagesResponseBody, lambda: _images_body("m-1"))
+    entry = tmp_path / f"{key}.json"
+    os.utime(entry, (0, 0))
+    result = cache.get_or_fetch(key, 60, DescribeImagesResponseBody, lambda: _images_body("m-2"))
+
+    assert result.images.image[0].image_id == "m-2"
+
+
+def test_refresh_bypasses_cache(tmp_path):
+    """Test that refresh mode always fetches."""
+    key = DescribeCache.key("DescribeImages", "cn-hangzhou", "*dev*")
+    DescribeCache(cache_dir=tmp_path).get_or_fetch(
+        key, 60, DescribeImagesResponseBody, lambda: _images_body("m-1")
+    )
+
+    cache = DescribeCache(cache_dir=tmp_path, refresh=True)
+    result = cache.get_or_fetch(key, 60, DescribeImagesResponseBody, lambda: _images_body("m-2"))
+
+    assert result.images.image[0].image_id == "m-2"
+
+
+def test_scopes_are_isolated(tmp_path):
+    """Test that entries cached under another scope are not served."""
+    key = DescribeCache.key("DescribeImages", "cn-hangzhou", "*dev*")
+    DescribeCache(cache_dir=tmp_path, scope="account-a").get_or_fetch(
+        key, 60, DescribeImagesResponseBody, lambda: _images_body("m-1")
+    )
+
+    cache = DescribeCache(cache_dir=tmp_path, scope="account-b")
+    result = cache.get_or_fetch(key, 60, DescribeImagesResponseBody, lambda: _images_body("m-2"))
+
+    assert result.images.image[0].image_id == "m-2"
@@ -0,0 +1,58 @@
+"""Test script to verify the pagination, chunking and latest-pick helpers."""
+
+from types import SimpleNamespace
+
+from alibabacloud_ecs20140526.models import (
+    DescribeSnapshotsRequest,
+    DescribeSnapshotsResponse,
+    DescribeSnapshotsResponseBodySnapshotsSnapshot as SnapshotInfo,
+)
+from aliyun_dev_server_cli.aliyun import _chunked, _paginate, _pick_latest
+
+
+def test_chunked():
+    """Test that a list is split into chunks of at most the given size."""
+    assert list(_chunked([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+    assert list(_chunked([], 2)) == []
+
+
+def test_paginate_follows_next_token():
+    """Test that every page is described, following the next token."""
+    pages = {
+        None: {"NextToken": "page-2", "Snapshots": {"Snapshot": [{"SnapshotId": "s-1"}]}},
+        "page-2": {"Snapshots": {"Snapshot": [{"SnapshotId": "s-2"}, {"SnapshotId": "s-3"}]}},
+    }
+    tokens = []
+
+    def describe(request):
+        tokens.append(request.next_token)
+        return DescribeSnapshotsResponse().from_map({"body": pages[request.next_token]})
+
+    snapshots = _paginate(describe, DescribeSnapshotsRequest(), lambda b: b.snapshots.snapshot)
+
+    assert [snapshot.snapshot_id for snapshot in snapshots] == ["s-1", "s-2", "s-3"]
+    assert tokens == [None, "page-2"]
+
+
+def test_pick_latest():
+    """Test that the most recently created item is picked and duplicates are logged."""
+    logged = []
+    snapshots = [
+        SnapshotInfo(snapshot_id="s-1", creation_time="2024-01-02T00:00:00Z"),
+        SnapshotInfo(snapshot_id="s-2", creation_time="2024-03-01T00:00:00Z"),
+        SnapshotInfo(snapshot_id="s-3", creation_time="2024-02-01T00:00:00Z"),
+    ]
+
+    latest = _pick_latest(snapshots, "snapshots", lambda *args: logged.append(args))
+
+    assert latest.snapshot_id == "s-2"
+    assert len(logged) == 1
+
+
+def test_pick_latest_single_item_is_not_logged():
+    """Test that a single candidate is picked without logging."""
+    logged = []
+    item = SimpleNamespace(creation_time=None)
+
+    assert _pick_latest([item], "vswitches", lambda *args: logged.append(args)) is item
+    assert logged == []
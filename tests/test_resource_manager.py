@@ -0,0 +1,75 @@
+"""Test script to verify that only validated resource group lookups are cached."""
+
+from types import SimpleNamespace
+
+from alibabacloud_resourcemanager20200331.models import ListResourceGroupsResponseBody
+from alibabacloud_tea_openapi.models import Config
+import pytest
+from aliyun_dev_server_cli import aliyun
+from aliyun_dev_server_cli.cache import DescribeCache
+
+
+class _FakeClient:
+    # Status of the listed resource group, shared by every client of a test
+    status = "OK"
+
+    def __init__(self, config):
+        self.calls = 0
+
+    def list_resource_groups(self, request):
+        self.calls += 1
+        return SimpleNamespace(
+            body=ListResourceGroupsResponseBody().from_map(
+                {"ResourceGroups": {"ResourceGroup": [{"Id": "rg-1", "Status": _FakeClient.status}]}}
+            )
+        )
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    _FakeClient.status = "OK"
+    monkeypatch.setattr(aliyun, "AliyunResourceManagerClient", _FakeClient)
+
+
+def _resource_manager_client(cache: DescribeCache) -> aliyun.ResourceManagerClient:
+    return aliyun.ResourceManagerClient(Config(access_key_id="key"), "dev", describe_cache=cache)
+
+
+def test_validated_lookup_is_cached(tmp_path, fake_client):
+    """Test that a valid lookup is cached and reused."""
+    cache = DescribeCache(cache_dir=tmp_path)
+
+    first = _resource_manager_client(cache)
+    second = _resource_manager_client(cache)
+
+    assert first.resource_group_id() == second.resource_group_id() == "rg-1"
+    assert (first.client.calls, second.client.calls) == (1, 0)
+
+
+def test_invalid_lookup_is_not_cached(tmp_path, fake_client):
+    """Test that a lookup failing validation is fetched once and not cached."""
+    cache = DescribeCache(cache_dir=tmp_path)
+    _FakeClient.status = "Creating"
+
+    with pytest.raises(ValueError):
+        _resource_manager_client(cache)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_invalid_cached_lookup_is_refetched(tmp_path, fake_client):
+    """Test that a cached lookup failing validation is replaced by a fresh one."""
+    cache = DescribeCache(cache_dir=tmp_path)
+    key = DescribeCache.key("ListResourceGroups", "key", "dev")
+    cache.put(
+        key,
+        ListResourceGroupsResponseBody().from_map(
+            {"ResourceGroups": {"ResourceGroup": [{"Id": "rg-0", "Status": "Deleted"}]}}
+        ),
+    )
+
+    first = _resource_manager_client(cache)
+    second = _resource_manager_client(cache)
+
+    assert first.resource_group_id() == second.resource_group_id() == "rg-1"
+    assert (first.client.calls, second.client.calls) == (1, 0)
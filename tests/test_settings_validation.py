@@ -1,7 +1,11 @@
 """Test script to verify that the single key dict validation works correctly."""
 
 import pytest
-from aliyun_dev_server_cli.settings import DevServerCreationSettings
+from aliyun_dev_server_cli.settings import (
+    DevServerCreationSettings,
+    Settings,
+    SpotInstanceCreationSettings,
+)
 
 
 def test_valid_single_key_dict():
@@ -41,4 +45,34 @@ def test_default_values():
         image_name_pattern="test-pattern"
     )
     assert settings.included_automation_tag == {"nysparis:automation-usage": "dev"}
-    assert settings.excluded_automation_tag == {"nysparis:automation-usage": "none"}
\ No newline at end of file
+    assert settings.excluded_automation_tag == {"nysparis:automation-usage": "none"}
+
+
+def test_settings_are_frozen():
+    """Test that settings cannot be modified once validated."""
+    settings = DevServerCreationSettings(
+        image_name_pattern="test-pattern"
+    )
+    with pytest.raises(ValueError):
+        settings.image_name_pattern = "other-pattern"
+
+
+def test_cache_scope_depends_on_account_and_region():
+    """Test that the cache scope only changes with the account and region."""
+    def settings(**kwargs):
+        dev_server = DevServerCreationSettings(
+            image_name_pattern="test-pattern",
+            instance_types_checklist=kwargs.pop("checklist", None),
+        )
+        return Settings(
+            _cli_parse_args=False,
+            _env_file=None,
+            access_key_secret="secret",
+            spot_instance_creation=SpotInstanceCreationSettings(dev_server=dev_server),
+            **kwargs,
+        )
+
+    scope = settings(access_key_id="key-a").cache_scope
+    assert settings(access_key_id="key-a", checklist=["ecs.g7.large"]).cache_scope == scope
+    assert settings(access_key_id="key-b").cache_scope != scope
+    assert settings(access_key_id="key-a", region_id="cn-beijing").cache_scope != scope
@@ -0,0 +1,182 @@
+"""Test script to verify spot price collection against a fake ECS client."""
+
+import threading
+
+from alibabacloud_ecs20140526.models import (
+    DescribeAvailableResourceResponse,
+    DescribeInstanceTypesResponseBodyInstanceTypesInstanceType as InstanceTypeInfo,
+    DescribePriceResponse,
+)
+from alibabacloud_tea_openapi.exceptions import ClientException
+import pytest
+from aliyun_dev_server_cli.spot_servers import batch_describe_price, describe_exact_price
+
+_unsupported_code = "InvalidSystemDiskCategory.ValueNotSupported"
+
+
+class _FakeClient:
+    def __init__(self, zone_ids, instance_type_ids, supported_categories):
+        self.zone_ids = zone_ids
+        self.instance_type_ids = instance_type_ids
+        self.supported_categories = supported_categories
+        self.price_calls = []
+        self._lock = threading.Lock()
+
+    def describe_available_resource(self, request):
+        resources = [
+            {"Value": instance_type_id, "Status": "Available"}
+            for instance_type_id in self.instance_type_ids
+        ]
+        return DescribeAvailableResourceResponse().from_map(
+            {
+                "body": {
+                    "AvailableZones": {
+                        "AvailableZone": [
+                            {
+                                "ZoneId": zone_id,
+                                "AvailableResources": {
+                                    "AvailableResource": [
+                                        {"SupportedResources": {"SupportedResource": resources}}
+                                    ]
+                                },
+                            }
+                            for zone_id in self.zone_ids
+                        ]
+                    }
+                }
+            }
+        )
+
+    def describe_price(self, request):
+        category = request.system_disk.category
+        with self._lock:
+            self.price_calls.append((request.instance_type, category))
+        if request.instance_type.startswith("ecs.throttled"):
+            raise ClientException(code="Throttling", message="throttled", data={"Code": "Throttling"})
+        if category not in self.supported_categories(request.instance_type):
+            raise ClientException(
+                code=_unsupported_code, message="unsupported", data={"Code": _unsupported_code}
+            )
+        cpu_count = int(request.instance_type.rpartition(".")[2])
+        return DescribePriceResponse().from_map(
+            {"body": {"PriceInfo": {"Price": {"TradePrice": 0.1 * cpu_count}}}}
+        )
+
+
+def _instance_type(instance_type_id: str) -> InstanceTypeInfo:
+    return InstanceTypeInfo(
+        instance_type_id=instance_type_id,
+        instance_type_family=instance_type_id.rpartition(".")[0],
+        cpu_core_count=int(instance_type_id.rpartition(".")[2]),
+    )
+
+
+def test_cloud_auto_is_probed_for_every_size():
+    """Test that a size rejecting cloud_auto doesn't disable it for its family."""
+    client = _FakeClient(
+        ["zone-a"],
+        ["ecs.g7.2", "ecs.g7.4"],
+        lambda it: {"cloud_efficiency"} if it == "ecs.g7.2" else {"cloud_auto", "cloud_efficiency"},
+    )
+
+    prices = batch_describe_price(
+        client, "region", map(_instance_type, ["ecs.g7.2", "ecs.g7.4"]), max_concurrency=1
+    )
+
+    categories = {price.instance_type_id: price.disk_category for price in prices}
+    assert categories == {"ecs.g7.2": "cloud_efficiency", "ecs.g7.4": "cloud_auto"}
+
+
+def test_rejected_categories_are_skipped_within_family():
+    """Test that a category rejected by a family is not probed again first."""
+    client = _FakeClient(
+        ["zone-a"],
+        ["ecs.g7.2", "ecs.g7.4"],
+        lambda it: {"cloud_essd"},
+    )
+
+    prices = batch_describe_price(
+        client, "region", map(_instance_type, ["ecs.g7.2", "ecs.g7.4"]), max_concurrency=1
+    )
+
+    assert [price.disk_category for price in prices] == ["cloud_essd", "cloud_essd"]
+    assert client.price_calls[3:] == [("ecs.g7.4", "cloud_auto"), ("ecs.g7.4", "cloud_essd")]
+
+
+def test_fast_price_scales_the_smallest_size():
+    """Test that only the smallest size of a family is priced in fast mode."""
+    instance_type_ids = ["ecs.g7.8", "ecs.g7.2", "ecs.g7.4"]
+    client = _FakeClient(["zone-a"], instance_type_ids, lambda it: {"cloud_auto"})
+
+    prices = batch_describe_price(
+        client, "region", map(_instance_type, instance_type_ids), fast_price=True
+    )
+
+    assert client.price_calls == [("ecs.g7.2", "cloud_auto")]
+    assert [price.instance_type_id for price in prices] == ["ecs.g7.2", "ecs.g7.4", "ecs.g7.8"]
+    assert [price.price.trade_price for price in prices] == pytest.approx([0.2, 0.4, 0.8])
+    assert [price.disk_category for price in prices] == ["cloud_auto", None, None]
+
+
+def test_estimated_price_is_priced_for_real():
+    """Test that an estimated price is re-priced with its own system disk category."""
+    instance_type_ids = ["ecs.g7.2", "ecs.g7.4"]
+    client = _FakeClient(
+        ["zone-a"],
+        instance_type_ids,
+        lambda it: {"cloud_auto"} if it == "ecs.g7.2" else {"cloud_essd"},
+    )
+    prices = batch_describe_price(
+        client, "region", map(_instance_type, instance_type_ids), fast_price=True
+    )
+
+    price = describe_exact_price(client, "region", prices[1])
+
+    assert prices[1].estimated
+    assert not price.estimated
+    assert (price.instance_type_id, price.zone_id) == ("ecs.g7.4", "zone-a")
+    assert price.disk_category == "cloud_essd"
+
+
+def test_top_k_keeps_the_cheapest_prices():
+    """Test that only the cheapest prices are returned, in ascending order."""
+    instance_type_ids = ["ecs.g7.8", "ecs.c7.2", "ecs.r7.16", "ecs.g7.4"]
+    client = _FakeClient(["zone-a"], instance_type_ids, lambda it: {"cloud_auto"})
+
+    prices = batch_describe_price(
+        client, "region", map(_instance_type, instance_type_ids), top_k=2
+    )
+
+    assert [price.instance_type_id for price in prices] == ["ecs.c7.2", "ecs.g7.4"]
+
+
+def test_unsupported_instance_types_are_ignored():
+    """Test that instance types supporting no system disk category are dropped."""
+    instance_type_ids = ["ecs.g7.2", "ecs.d1.4"]
+    client = _FakeClient(
+        ["zone-a"], instance_type_ids, lambda it: set() if it == "ecs.d1.4" else {"cloud_auto"}
+    )
+
+    prices = batch_describe_price(client, "region", map(_instance_type, instance_type_ids))
+
+    assert [price.instance_type_id for price in prices] == ["ecs.g7.2"]
+
+
+def test_single_exception_is_raised_as_is():
+    """Test that a single failed price raises its own exception."""
+    instance_type_ids = ["ecs.g7.2", "ecs.throttled.4"]
+    client = _FakeClient(["zone-a"], instance_type_ids, lambda it: {"cloud_auto"})
+
+    with pytest.raises(ClientException):
+        batch_describe_price(client, "region", map(_instance_type, instance_type_ids))
+
+
+def test_exceptions_are_grouped():
+    """Test that several failed prices are raised together."""
+    instance_type_ids = ["ecs.g7.2", "ecs.throttled.4"]
+    client = _FakeClient(["zone-a", "zone-b"], instance_type_ids, lambda it: {"cloud_auto"})
+
+    with pytest.raises(ExceptionGroup) as exc_info:
+        batch_describe_price(client, "region", map(_instance_type, instance_type_ids))
+
+    assert len(exc_info.value.exceptions) == 2